@@ -1,5 +1,9 @@
 import os
-import threading
+import sys
+import time
+import signal
+import socket
+import argparse
 from concurrent.futures import ThreadPoolExecutor
 import gi
 
@@ -9,7 +13,9 @@ gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk, Gdk, GLib
 
 from search import SearchInFiles as search  # Import your search module
-from gi.repository import GdkPixbuf
+from client import SOCKET_PATH, signal_resident
+from icons import IconStore
+import tracing
 
 window_width, window_height = 900, 50
 display = Gdk.Display.get_default()
@@ -20,13 +26,85 @@ if monitor:
 else:
     Y_CENTER = 0
 
+# Adaptive debounce: wait about twice the recent query latency before searching
+DEBOUNCE_MIN_MS = 0
+DEBOUNCE_MAX_MS = 500
+DEBOUNCE_LATENCY_FACTOR = 2
+LATENCY_SMOOTHING = 0.3  # Weight of the newest sample in the latency average
+
+RESULT_ROWS = 10  # Result rows allocated per category at a time (one page of search results)
+RESULTS_MAX_HEIGHT = 600  # Pixels of results shown before the list scrolls
+
+
+class ResultRow(Gtk.EventBox):
+    # A result row created once and rebound to new results while typing.
+    def __init__(self, with_path=True):
+        super().__init__()
+        self.item_type = None
+        self.payload = None
+        self.index = -1
+        self.pixbuf = None
+        self.add_events(Gdk.EventMask.ENTER_NOTIFY_MASK)
+
+        self.box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=2)
+        self.box.get_style_context().add_class("file-list-box")
+
+        self.image = Gtk.Image()
+        self.image.set_halign(Gtk.Align.CENTER)
+        self.image.set_valign(Gtk.Align.CENTER)
+
+        self.name_label = Gtk.Label()
+        self.name_label.set_halign(Gtk.Align.CENTER)
+        self.name_label.get_style_context().add_class("filename-text")
+        self.name_label.set_valign(Gtk.Align.CENTER)
+
+        self.box.pack_start(self.image, False, False, 0)
+        self.box.pack_start(self.name_label, False, False, 0)
+
+        self.path_label = None
+        if with_path:
+            self.path_label = Gtk.Label()
+            self.path_label.get_style_context().add_class("filepath-text")
+            self.path_label.set_halign(Gtk.Align.END)
+            self.box.pack_start(self.path_label, False, False, 0)
+
+        self.add(self.box)
+
+    def bind(self, item_type, name, payload, pixbuf, index):
+        # Point the row at a new result, only touching the widgets that change.
+        self.item_type = item_type
+        self.payload = payload
+        self.index = index
+
+        if self.name_label.get_text() != name:
+            self.name_label.set_text(name)
+        if self.path_label is not None:
+            path_txt = payload.replace(os.path.expanduser("~"), "~")
+            if len(payload) > 60:
+                path_txt = '...' + payload[30:]
+            if self.path_label.get_text() != path_txt:
+                self.path_label.set_text(path_txt)
+        if pixbuf is not self.pixbuf:
+            self.image.set_from_pixbuf(pixbuf)
+            self.pixbuf = pixbuf
+
+        self.set_focused(False)
+        self.show()
+
+    def set_focused(self, focused):
+        if focused:
+            self.box.get_style_context().add_class("focused-result")
+        else:
+            self.box.get_style_context().remove_class("focused-result")
+
 
 class SpotlightClone(Gtk.Window):
-    def __init__(self):
-        # Add icon cache dictionaries
-        self.file_icon_cache = {}
-        self.app_icon_cache = {}
-        self.pixbuf_cache = {}  
+    def __init__(self, resident=False):
+        # Resident windows are hidden after use instead of quitting the process
+        self.resident = resident
+        # Icons are decoded off the main thread while the window is built
+        self.icons = IconStore()
+        self.icons.preload()
         # Initialize the SpotlightClone window with UI setup and configurations.
         super().__init__(title="Spotlight")
         self.set_default_size(900, 50)
@@ -60,15 +138,28 @@ class SpotlightClone(Gtk.Window):
         # Thread pool for search
         self.executor = ThreadPoolExecutor(max_workers=4)
 
-        # Debounce timer
-        self.debounce_timer = None
+        # Debounce timeout (GLib source id) and search bookkeeping. Every keystroke
+        # bumps the generation, so results of superseded searches are dropped.
+        self.debounce_source = None
+        self.search_generation = 0
+        self.pending_futures = []
+        self.keystroke_time = time.perf_counter()
+        self.query_latency = 0.1  # Seconds, smoothed over recent searches
 
-        # Ordered result widgets for focus/keyboard navigation.
+        # Ordered result rows for focus/keyboard navigation.
         self.result_items = []
         self.selected_result_index = -1
 
         # Dictionary to store search results
         self.search_results = {}
+        self.search_results_apps = []
+        self.search_results_files = []
+        self.search_results_dirs = []
+        # Files and directories come a page at a time: cursors of the next pages,
+        # and the row the selection was on when more were asked for
+        self.cursors = {}
+        self.loading_more = set()
+        self.more_anchor = None
 
         # UI Setup
         vbox_general = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
@@ -117,18 +208,39 @@ class SpotlightClone(Gtk.Window):
         self.vbox_list_container.pack_start(self.file_list_box, True, True, 1)
         self.vbox_list_container.pack_start(self.dir_title, False, False, 0)
         self.vbox_list_container.pack_start(self.dir_list_box, True, True, 1)
-        
 
-        # Add vbox_list_container to vbox_general
-        vbox_general.pack_start(self.vbox_list_container, True, True, 1)
+        # Result rows are allocated once and rebound on every update
+        self.app_rows = self.create_rows(self.app_list_box, with_path=False)
+        self.file_rows = self.create_rows(self.file_list_box)
+        self.dir_rows = self.create_rows(self.dir_list_box)
+
+        # Add vbox_list_container to vbox_general; it grows with the results up to
+        # RESULTS_MAX_HEIGHT and scrolls past that (e.g. after "show more")
+        self.results_scroll = Gtk.ScrolledWindow()
+        self.results_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        self.results_scroll.set_propagate_natural_height(True)
+        self.results_scroll.set_max_content_height(RESULTS_MAX_HEIGHT)
+        self.results_scroll.add(self.vbox_list_container)
+        vbox_general.pack_start(self.results_scroll, True, True, 1)
 
         # Apply CSS
         self.apply_styles()
 
         self.show_all()
+        for row in self.app_rows + self.file_rows + self.dir_rows:
+            row.hide()
         self.vbox_list_container.hide()
 
-    
+    def create_rows(self, list_box, with_path=True):
+        rows = []
+        for _ in range(RESULT_ROWS):
+            row = ResultRow(with_path)
+            row.connect("enter-notify-event", self.on_result_hover)
+            row.connect("button-press-event", self.on_result_clicked)
+            list_box.pack_start(row, False, False, 0)
+            rows.append(row)
+        return rows
+
     def apply_styles(self):
         # Apply CSS styles to the window.
         css_provider = Gtk.CssProvider()
@@ -150,6 +262,8 @@ class SpotlightClone(Gtk.Window):
 
         if event.keyval == Gdk.KEY_Down:
             if self.result_items:
+                if self.selected_result_index == len(self.result_items) - 1:
+                    self.show_more()
                 next_index = min(self.selected_result_index + 1, len(self.result_items) - 1)
                 self.set_selected_result(next_index)
             return True
@@ -165,49 +279,173 @@ class SpotlightClone(Gtk.Window):
                 self.open_first_app(widget)
             return True
 
-        if self.debounce_timer:
-            self.debounce_timer.cancel()
+        with tracing.span("on_key_press"):
+            self.keystroke_time = time.perf_counter()
+            self.cancel_search()
+            self.debounce_source = GLib.timeout_add(self.debounce_delay(), self.debounce_search)
+        return False
 
-        def debounce_search():
-            search_text = widget.get_text()
-            if self.executor._shutdown:
-                return
+    def debounce_delay(self):
+        # Near zero when searches are fast (e.g. cache hits), up to DEBOUNCE_MAX_MS when slow.
+        delay = self.query_latency * 1000 * DEBOUNCE_LATENCY_FACTOR
+        return int(min(DEBOUNCE_MAX_MS, max(DEBOUNCE_MIN_MS, delay)))
+
+    def cancel_search(self):
+        # Drop the pending debounce and supersede any search still in flight.
+        if self.debounce_source:
+            GLib.source_remove(self.debounce_source)
+            self.debounce_source = None
+        self.search_generation += 1
+        for future in self.pending_futures:
+            future.cancel()  # Only succeeds for lookups still waiting in the pool
+        self.pending_futures = []
+        self.cursors = {}
+        self.loading_more = set()
+        self.more_anchor = None
+
+    def debounce_search(self):
+        # Runs on the main loop once typing paused; starts the lookups in the pool.
+        self.debounce_source = None
+        if self.executor._shutdown:
+            return False
 
-            future_files = self.executor.submit(search.search_files, search_text)
-            result_files = future_files.result() or {}
+        generation = self.search_generation
+        search_text = self.search_entry.get_text()
+        started = time.perf_counter()
+        tracing.record("debounce_wait", self.keystroke_time, started)
+
+        # Submit all lookups at once, so they run concurrently; each category is
+        # shown as soon as its own lookup finishes
+        lookups = (
+            ("app", search.search_application),
+            ("file", search.search_files_page),
+            ("dir", search.search_dirs_page),
+        )
+        self.pending_futures = []
+        progress = {"remaining": len(lookups), "total": len(lookups)}
+        for item_type, lookup in lookups:
+            future = tracing.submit(self.executor, "executor_queue", lookup, search_text)
+            future.add_done_callback(
+                lambda future, item_type=item_type: GLib.idle_add(
+                    self.finish_category, generation, item_type, future, started, progress))
+            self.pending_futures.append(future)
+        return False
 
-            future_dirs = self.executor.submit(search.search_dirs, search_text)
-            result_dirs = future_dirs.result() or {}
+    def finish_category(self, generation, item_type, future, started, progress):
+        # Show one category's results, unless a newer keystroke superseded this search.
+        if generation != self.search_generation or future.cancelled():
+            return False
+        progress["remaining"] -= 1
+        first = progress["remaining"] == progress["total"] - 1
+        last = progress["remaining"] == 0
+        if last:
+            self.pending_futures = []
+            elapsed = time.perf_counter() - started
+            self.query_latency += LATENCY_SMOOTHING * (elapsed - self.query_latency)
+
+        results = future.result()
+        if item_type == "app":
+            # Enter launches the first app, no need to wait for files and directories
+            results = list((results or {}).items())
+            self.first_app_command = results[0][1] if results else ''
+        else:
+            results, self.cursors[item_type] = results
+        tracing.record(f"results_ready.{item_type}", started)
+        with tracing.span("update_list", category=item_type):
+            self.update_category(item_type, results)
+        if tracing.enabled and (first or last):
+            # Redraws run at a higher priority than idle callbacks, so this fires after the paint
+            GLib.idle_add(self.trace_painted, self.keystroke_time,
+                          "keystroke_to_paint" if last else "keystroke_to_first_paint",
+                          priority=GLib.PRIORITY_DEFAULT_IDLE)
+        return False
 
-            future_apps = self.executor.submit(search.search_application, search_text)
-            result_apps = future_apps.result() or {}
+    def trace_painted(self, keystroke_time, name):
+        tracing.record(name, keystroke_time)
+        return False
 
-            GLib.idle_add(self.update_list, result_apps, result_files, result_dirs)
-            self.first_app_command = next(iter(result_apps.values()), '')
+    def show_more(self):
+        # The selection is about to move past the last row: fetch the next page of every
+        # category that has more. Each page costs a keyset query, like the first one.
+        self.more_anchor = self.result_items[self.selected_result_index]
+        generation = self.search_generation
+        lookups = {"file": search.search_files_page, "dir": search.search_dirs_page}
+        for item_type, cursor in self.cursors.items():
+            if cursor is None or item_type in self.loading_more:
+                continue
+            self.loading_more.add(item_type)
+            future = self.executor.submit(lookups[item_type], cursor.term, cursor)
+            future.add_done_callback(
+                lambda future, item_type=item_type: GLib.idle_add(self.finish_more, generation, item_type, future))
+            self.pending_futures.append(future)
+
+    def finish_more(self, generation, item_type, future):
+        # Append the next page of a category below the rows it already shows.
+        if generation != self.search_generation or future.cancelled():
+            return False
+        self.loading_more.discard(item_type)
+        page, self.cursors[item_type] = future.result()
+        # The cursor never returns a path twice, so the page only adds rows
+        results = (self.search_results_files if item_type == "file" else self.search_results_dirs) + page
+        with tracing.span("update_list", category=item_type):
+            self.update_category(item_type, results, extend=True)
+
+        # Step onto the first new row, unless the user moved the selection meanwhile
+        anchor = self.more_anchor
+        if anchor in self.result_items and anchor.index == self.selected_result_index \
+                and anchor.index + 1 < len(self.result_items):
+            self.more_anchor = None
+            self.set_selected_result(anchor.index + 1)
+        return False
 
 
-        self.debounce_timer = threading.Timer(0.5, debounce_search)  # Wrap event in a tuple
-        self.debounce_timer.start()
 
-        
+    def update_list(self, results_apps, results_files, results_dirs):
+        # Rebind every category at once (e.g. to clear the list)
+        self.update_category("app", results_apps)
+        self.update_category("file", results_files)
+        self.update_category("dir", results_dirs)
         return False
 
+    def update_category(self, item_type, results, extend=False):
+        # Rebind the preallocated rows of one category; the others keep showing what they show.
+        # A row the user moved the selection to stays selected, otherwise the first result is.
+        # extend: results only add to those shown, so every row keeps its result.
+        selected = None
+        if 0 < self.selected_result_index < len(self.result_items):
+            selected = self.result_items[self.selected_result_index]
+            if selected.item_type == item_type and not extend:
+                selected = None  # Its row is about to show another result
 
-
-    def update_list(self, results_apps, results_files, results_dirs):
-        # Clear existing widgets
-        self.file_list_box.foreach(lambda w: w.destroy())
-        self.dir_list_box.foreach(lambda w: w.destroy()) 
-        self.app_list_box.foreach(lambda w: w.destroy())
-        self.result_items = []
+        if item_type == "app":
+            self.search_results_apps = results
+            rows, list_box = self.app_rows, self.app_list_box
+        elif item_type == "file":
+            self.search_results_files = results
+            rows, list_box = self.file_rows, self.file_list_box
+        else:
+            self.search_results_dirs = results
+            rows, list_box = self.dir_rows, self.dir_list_box
+        while len(rows) < len(results):
+            # Pages shown past the rows allocated so far: allocate another page of rows
+            new_rows = self.create_rows(list_box, with_path=item_type != "app")
+            for row in new_rows:
+                row.show_all()
+                row.hide()
+            rows += new_rows
+        self.bind_rows(rows, item_type, results)
+
+        # Renumber the visible rows in display order for keyboard navigation
+        self.result_items = [row for row in self.app_rows + self.file_rows + self.dir_rows if row.get_visible()]
+        for index, row in enumerate(self.result_items):
+            row.index = index
+            row.set_focused(False)
         self.selected_result_index = -1
-        
-        self.search_results_files = results_files  
-        self.search_results_apps = results_apps
-        self.search_results_dirs = results_dirs
 
+        results_apps, results_files, results_dirs = (
+            self.search_results_apps, self.search_results_files, self.search_results_dirs)
         # Check if we have any results
-        if not (results_apps or results_files or results_dirs):
+        if not self.result_items:
             self.hide_box()
             self.resize(900, 50)
             self.move(self.x, Y_CENTER)
@@ -215,45 +453,34 @@ class SpotlightClone(Gtk.Window):
 
         # Update window position
         self.redefine_position(results_apps, results_files, results_dirs)
-        
-        # Create and add app widgets
-        for appname, appcommand in results_apps.items():
-            widget = self.create_app_widget(appname, appcommand)
-            self.register_result_widget(widget, "app", appcommand)
-            self.app_list_box.pack_start(widget, False, False, 0)
-
-        # Create and add file widgets
-        for filename, filepath in results_files.items():
-            widget = self.create_file_widget(filename, filepath)
-            self.register_result_widget(widget, "file", filepath)
-            self.file_list_box.pack_start(widget, False, False, 0)
-
-        # Create and add directory widgets
-        for dir_name, dir_path in results_dirs.items():
-            widget = self.create_dir_widget(dir_name, dir_path)
-            self.register_result_widget(widget, "dir", dir_path)
-            self.dir_list_box.pack_start(widget, False, False, 0)
-
         self.show_box()
         self.resize(900, 300)
-        self.show_all()
-        if self.result_items:
-            self.set_selected_result(0)
+        self.set_selected_result(selected.index if selected in self.result_items else 0)
         return False
 
-    def register_result_widget(self, event_box, item_type, payload):
-        item_index = len(self.result_items)
-        event_box.add_events(Gdk.EventMask.ENTER_NOTIFY_MASK)
-        event_box.connect("enter-notify-event", self.on_result_hover, item_index)
-        event_box.connect("button-press-event", self.on_result_clicked, item_index)
-        self.result_items.append((event_box, item_type, payload))
+    def bind_rows(self, rows, item_type, results):
+        # Bind the first rows to results ((name, path or command) pairs) and hide the rest.
+        items = results[:len(rows)]
+        for row, (name, payload) in zip(rows, items):
+            row.bind(item_type, name, payload, self.get_result_pixbuf(item_type, name), row.index)
+        for row in rows[len(items):]:
+            if row.get_visible():
+                row.hide()
+
+    def get_result_pixbuf(self, item_type, name):
+        if item_type == "app":
+            return self.icons.app_icon(name)
+        if item_type == "file":
+            return self.icons.file_icon(name)
+        return self.icons.folder_icon()
 
-    def on_result_hover(self, widget, event, index):
-        self.set_selected_result(index)
+    def on_result_hover(self, row, event):
+        self.set_selected_result(row.index)
         return False
 
-    def on_result_clicked(self, widget, event, index):
-        self.set_selected_result(index)
+    def on_result_clicked(self, row, event):
+        self.set_selected_result(row.index)
+        self.activate_selected_result()
         return False
 
     def set_selected_result(self, index):
@@ -261,20 +488,35 @@ class SpotlightClone(Gtk.Window):
             return
 
         if 0 <= self.selected_result_index < len(self.result_items):
-            old_widget = self.result_items[self.selected_result_index][0].get_child()
-            if old_widget:
-                old_widget.get_style_context().remove_class("focused-result")
+            self.result_items[self.selected_result_index].set_focused(False)
 
         self.selected_result_index = index
-        new_widget = self.result_items[index][0].get_child()
-        if new_widget:
-            new_widget.get_style_context().add_class("focused-result")
+        self.result_items[index].set_focused(True)
+        # Once the rows are laid out (redraws run before idle callbacks)
+        GLib.idle_add(self.scroll_to_selected)
+
+    def scroll_to_selected(self):
+        # Scroll the results just enough to show the selected row.
+        if not 0 <= self.selected_result_index < len(self.result_items):
+            return False
+        row = self.result_items[self.selected_result_index]
+        position = row.translate_coordinates(self.vbox_list_container, 0, 0)
+        if position is None:  # Not realized yet
+            return False
+        top, height = position[1], row.get_allocated_height()
+        adjustment = self.results_scroll.get_vadjustment()
+        if top < adjustment.get_value():
+            adjustment.set_value(top)
+        elif top + height > adjustment.get_value() + adjustment.get_page_size():
+            adjustment.set_value(top + height - adjustment.get_page_size())
+        return False
 
     def activate_selected_result(self):
         if self.selected_result_index < 0 or self.selected_result_index >= len(self.result_items):
             return
 
-        _, item_type, payload = self.result_items[self.selected_result_index]
+        row = self.result_items[self.selected_result_index]
+        item_type, payload = row.item_type, row.payload
         if item_type == "app":
             search.run_applications(payload)
         elif item_type == "file":
@@ -282,42 +524,39 @@ class SpotlightClone(Gtk.Window):
         elif item_type == "dir":
             search.open_directory(payload)
 
-        if not self.executor._shutdown:
-            self.executor.shutdown(wait=False)
-        Gtk.main_quit()
-
-    def open_file(self, widget, event, filepath):
-        # Opens the selected file.
-        search.open_file(filepath)
-        self.executor.shutdown(wait=False)
-        Gtk.main_quit()
-
-    def open_dir(self, widget, event, dir_path):
-        # Opens the selected directory.
-        search.open_directory(dir_path)
-        self.executor.shutdown(wait=False)
-        Gtk.main_quit()
-
-    def run_apps(self, widget, event, app_name):
-        # Opens the selected application.
-        search.run_applications(app_name)
-        self.executor.shutdown(wait=False)
-        Gtk.main_quit()
+        self.dismiss()
 
     def open_first_app(self, widget, event=None):
         if not self.first_app_command:
             return
 
         search.run_applications(self.first_app_command)
-        if not self.executor._shutdown:
+        self.dismiss()
+
+    def dismiss(self):
+        # Hide the window when resident, otherwise quit the application.
+        self.cancel_search()
+
+        if self.resident:
+            self.hide()
+            return
+
+        if not self.executor._shutdown:  # Ensure the executor is not already shut down
             self.executor.shutdown(wait=False)
         Gtk.main_quit()
 
+    def summon(self):
+        # Show the (resident) window again with an empty search.
+        self.search_entry.set_text("")
+        self.first_app_command = ''
+        self.update_list([], [], [])
+        self.move(self.x, Y_CENTER)
+        self.show()
+        self.present()
+        self.search_entry.grab_focus()
+
     def close_window(self, widget, event=None):
         # Closes the window and opens the first search result (if any).
-        if self.debounce_timer:
-            self.debounce_timer.cancel()
-
         if self.search_results:
             first_key = next(iter(self.search_results))
             first_value = self.search_results[first_key]
@@ -326,10 +565,7 @@ class SpotlightClone(Gtk.Window):
         else:
             print("No search results to open.")
 
-        if not self.executor._shutdown:  # Ensure the executor is not already shut down
-            self.executor.shutdown(wait=False)
-
-        Gtk.main_quit()
+        self.dismiss()
 
     def show_box(self):
         # Show the file and application result boxes.
@@ -339,75 +575,6 @@ class SpotlightClone(Gtk.Window):
         # Hide the file and application result boxes.
         self.vbox_list_container.hide()
 
-    def get_type_of_file(self, filename):
-        # Check cache first
-        if filename in self.file_icon_cache:
-            return self.file_icon_cache[filename]
-            
-        icon_path = 'assets/file_icons/txt.png' # Default
-        
-        # Determine icon path based on extension
-        for ext, icon in {
-            '.py': 'python.png',
-            '.txt': 'txt.png',
-            '.cpp': 'cpp.png',
-            '.c': 'cpp.png',
-            '.png': 'image.png',
-            '.jpg': 'image.png',
-            '.jpeg': 'image.png',
-            '.pdf': 'pdf.png',
-            '.json': 'json.png',
-            '.html': 'html.png',
-            '.js': 'js.png',
-            '.vue': 'vue.png'
-        }.items():
-            if filename.endswith(ext):
-                icon_path = f'assets/file_icons/{icon}'
-                break
-                
-        self.file_icon_cache[filename] = icon_path
-        return icon_path
-    
-    def get_app_icon(self, app_name):
-        # Returns the icon path for the given application name.
-        if(app_name == 'firefox'):
-            return 'assets/app_icons/firefox.png'
-        elif(app_name == 'visual studio code'):
-            return 'assets/app_icons/visual-studio-code.png'
-        elif(app_name == 'whatsapp'):
-            return 'assets/app_icons/whatsapp.png'
-        elif(app_name == 'emacs'):
-            return 'assets/app_icons/emacs.png'
-        elif(app_name == 'appunti'):
-            return 'assets/app_icons/appunti.png'
-        elif(app_name == 'spotify'):
-            return 'assets/app_icons/spotify.png'
-        elif(app_name == 'overleaf'):
-            return 'assets/app_icons/overleaf.png'
-        elif(app_name == 'zoom'):  
-            return 'assets/app_icons/zoom.png'
-        elif(app_name == 'gaia-app'):
-            return 'assets/app_icons/gaia.png'
-        elif(app_name == 'gaia-web'):
-            return 'assets/app_icons/gaia.png'
-        elif(app_name == 'moodle'):
-            return 'assets/app_icons/moodle.png'
-        elif(app_name == 'telegram'):
-            return 'assets/app_icons/telegram.png'
-        elif(app_name == 'postman'):
-            return 'assets/app_icons/postman.png'
-        elif(app_name == 'gmail'):
-            return 'assets/app_icons/gmail.png'
-        elif (app_name == 'studio'):
-            return 'assets/app_icons/appunti.png'
-        elif (app_name == 'notetom'):
-            return 'assets/app_icons/notetom.png'
-        elif (app_name == 'intellij'):
-            return 'assets/app_icons/intellij.png'
-
-        
-        return 'assets/app_icons/app.png'
-
     def redefine_position(self, results_apps, results_files, results_dirs):
         # Dynamically adjust self.y without modifying the constant center value
         if (len(results_apps) > 5 or len(results_files) > 5 or len(results_dirs) > 5):
@@ -415,105 +582,6 @@ class SpotlightClone(Gtk.Window):
         else:
             self.move(self.x, Y_CENTER)
 
-    def create_app_widget(self, appname, appcommand):
-        event_box_app = Gtk.EventBox()
-        box_app = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=2)
-        box_app.get_style_context().add_class("file-list-box")
-
-        appname_label = Gtk.Label(label=appname)
-        appname_label.set_halign(Gtk.Align.CENTER)
-        appname_label.get_style_context().add_class("filename-text")
-        appname_label.set_valign(Gtk.Align.CENTER)
-
-        img_path = self.get_app_icon(appname)
-        
-        # Cache pixbufs
-        if img_path not in self.app_icon_cache:
-            self.app_icon_cache[img_path] = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                os.path.join(os.path.dirname(__file__), img_path), 23, 23
-            )
-        
-        image = Gtk.Image.new_from_pixbuf(self.app_icon_cache[img_path])
-        image.set_halign(Gtk.Align.CENTER)
-        image.set_valign(Gtk.Align.CENTER)
-
-        box_app.pack_start(image, False, False, 0)
-        box_app.pack_start(appname_label, False, False, 0)
-        event_box_app.add(box_app)
-        event_box_app.connect("button-press-event", self.run_apps, appcommand)
-
-        return event_box_app
-
-    def create_file_widget(self, filename, filepath):
-        event_box = Gtk.EventBox()
-        box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=2)
-        box.get_style_context().add_class("file-list-box")
-
-        filename_label = Gtk.Label(label=filename)
-        filename_label.set_halign(Gtk.Align.CENTER)
-        filename_label.get_style_context().add_class("filename-text")
-        filename_label.set_valign(Gtk.Align.CENTER)
-
-        path_txt = filepath.replace(os.path.expanduser("~"), "~")
-        if len(filepath) > 60:
-            path_txt = '...' + filepath[30:]
-        filepath_label = Gtk.Label(label=path_txt)
-        filepath_label.get_style_context().add_class("filepath-text")
-        filepath_label.set_halign(Gtk.Align.END)
-
-        img_path = self.get_type_of_file(filename)
-        if img_path not in self.pixbuf_cache:
-            self.pixbuf_cache[img_path] = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                os.path.join(os.path.dirname(__file__), img_path), 23, 23
-            )
-        
-        image = Gtk.Image.new_from_pixbuf(self.pixbuf_cache[img_path])
-        image.set_halign(Gtk.Align.CENTER)
-        image.set_valign(Gtk.Align.CENTER)
-
-        box.pack_start(image, False, False, 0)
-        box.pack_start(filename_label, False, False, 0)
-        box.pack_start(filepath_label, False, False, 0)
-        event_box.add(box)
-        event_box.connect("button-press-event", self.open_file, filepath)
-
-        return event_box
-
-    def create_dir_widget(self, dir_name, dir_path):
-        event_box = Gtk.EventBox()
-        box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=2)
-        box.get_style_context().add_class("file-list-box")
-
-        dir_name_label = Gtk.Label(label=dir_name)
-        dir_name_label.set_halign(Gtk.Align.CENTER)
-        dir_name_label.get_style_context().add_class("filename-text")
-        dir_name_label.set_valign(Gtk.Align.CENTER)
-
-        path_txt = dir_path.replace(os.path.expanduser("~"), "~")
-        if len(dir_path) > 60:
-            path_txt = '...' + dir_path[30:]
-        dirpath_label = Gtk.Label(label=path_txt)
-        dirpath_label.get_style_context().add_class("filepath-text")
-        dirpath_label.set_halign(Gtk.Align.END)
-
-        img_path = 'assets/folder.png'
-        if img_path not in self.pixbuf_cache:
-            self.pixbuf_cache[img_path] = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                os.path.join(os.path.dirname(__file__), img_path), 23, 23
-            )
-        
-        image = Gtk.Image.new_from_pixbuf(self.pixbuf_cache[img_path])
-        image.set_halign(Gtk.Align.CENTER)
-        image.set_valign(Gtk.Align.CENTER)
-
-        box.pack_start(image, False, False, 0)
-        box.pack_start(dir_name_label, False, False, 0)
-        box.pack_start(dirpath_label, False, False, 0)
-        event_box.add(box)
-        event_box.connect("button-press-event", self.open_dir, dir_path)
-
-        return event_box
-
     def __del__(self):
         if hasattr(self, "executor") and not self.executor._shutdown:
             self.executor.shutdown(wait=False)
@@ -521,7 +589,100 @@ class SpotlightClone(Gtk.Window):
 
 
 
+def serve(win):
+    # Listen on the Unix socket used by client.py and by later app.py invocations.
+    # Returns None if another launcher is already listening on it.
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        probe.settimeout(1)
+        try:
+            probe.connect(SOCKET_PATH)
+            return None
+        except OSError:
+            pass
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)  # Left over by a launcher that did not exit cleanly
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o077)  # Owner-only from the start, no window before a chmod
+    try:
+        server.bind(SOCKET_PATH)
+    finally:
+        os.umask(umask)
+    server.listen(4)
+
+    def on_connection(fd, condition):
+        conn, _ = server.accept()
+        with conn:
+            conn.settimeout(1)
+            try:
+                command = conn.recv(64).decode(errors="replace").strip()
+            except OSError:
+                command = ""
+        if command == "show":
+            win.summon()
+        elif command == "quit":
+            Gtk.main_quit()
+        elif command == "stats":
+            dump_trace()
+        return True
+
+    GLib.io_add_watch(server.fileno(), GLib.PRIORITY_DEFAULT, GLib.IOCondition.IN, on_connection)
+    return server
+
+
+def dump_trace():
+    # Print the latency histograms and write the spans as a Chrome trace file.
+    tracing.dump_stats(sys.stdout)
+    print(f"Trace written to {tracing.export_trace()}", flush=True)
+    return True  # Keep the signal handler installed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spotlight Clone")
+    parser.add_argument("--oneshot", action="store_true",
+                        help="Quit after each use instead of staying resident")
+    parser.add_argument("--trace", action="store_true",
+                        help="Record latency spans; dump them with SIGUSR1 or --stats")
+    parser.add_argument("--stats", action="store_true",
+                        help="Make the resident launcher print its latency histograms and write its trace")
+    args = parser.parse_args()
+
+    if args.stats:
+        if not signal_resident("stats"):
+            print("No resident launcher is running")
+        return
+    if args.trace:
+        tracing.enable()
+
+    # A resident launcher is already running: just bring its window up
+    if not args.oneshot and signal_resident("show"):
+        return
+
+    win = SpotlightClone(resident=not args.oneshot)
+    win.connect("destroy", Gtk.main_quit)
+    server = None
+    if tracing.enabled:
+        GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR1, dump_trace)
+    if not args.oneshot:
+        win.connect("delete-event", lambda widget, event: widget.hide_on_delete())
+        server = serve(win)
+        if server is None:
+            # Another launcher started at the same time and won the socket
+            win.executor.shutdown(wait=False)
+            signal_resident("show")
+            return
+    try:
+        Gtk.main()
+    finally:
+        if server:
+            server.close()
+            if os.path.exists(SOCKET_PATH):
+                os.unlink(SOCKET_PATH)
+        if not win.executor._shutdown:
+            win.executor.shutdown(wait=False)
+        if tracing.enabled:
+            dump_trace()
+
+
 # Run the application
-win = SpotlightClone()
-win.connect("destroy", Gtk.main_quit)
-Gtk.main()
+if __name__ == "__main__":
+    main()
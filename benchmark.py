@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import deque
+
+# Reproducible benchmark of index builds and search latency on synthetic trees:
+#   python3 benchmark.py --entries 100000 --output results.json
+# Everything runs in a scratch data directory, the real index is never touched.
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ro", "ta", "vi", "su", "de", "pa", "zo", "ri", "an", "el", "or", "us"]
+COMMON_WORDS = ["report", "final", "notes", "main", "test", "data", "image", "project", "draft", "config",
+                "utils", "index", "readme", "backup", "invoice", "thesis", "photo", "lecture", "homework", "budget"]
+EXTENSIONS = [".txt", ".py", ".pdf", ".md", ".jpg", ".png", ".json", ".c", ".js", ".html", ".tex", ""]
+EXTENSION_WEIGHTS = [10, 8, 6, 6, 8, 5, 4, 3, 4, 2, 2, 3]
+SEPARATORS = ["_", "-", " ", ""]
+
+
+def make_vocabulary(rng, size):
+    """COMMON_WORDS followed by pseudo-words, most frequent first"""
+    words = list(COMMON_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+class NameGenerator:
+    """File and directory names whose words follow a Zipf distribution"""
+    def __init__(self, rng, vocabulary_size, zipf):
+        self.rng = rng
+        self.words = make_vocabulary(rng, vocabulary_size)
+        self.weights = [1 / (rank + 1) ** zipf for rank in range(len(self.words))]
+
+    def stem(self):
+        words = self.rng.choices(self.words, self.weights, k=self.rng.choice((1, 1, 2, 2, 3)))
+        if self.rng.random() < 0.1:
+            words = [words[0]] + [word.capitalize() for word in words[1:]]  # camelCase
+            stem = "".join(words)
+        else:
+            stem = self.rng.choice(SEPARATORS[:3]).join(words)
+        if self.rng.random() < 0.3:
+            stem += f"_{self.rng.randint(1, 999)}"
+        return stem
+
+    def file_name(self):
+        return self.stem() + self.rng.choices(EXTENSIONS, EXTENSION_WEIGHTS)[0]
+
+    def dir_name(self):
+        return self.stem()
+
+
+def generate_tree(root, entries, depth, fanout, files_per_dir, vocabulary_size, zipf, seed):
+    """
+    Create a synthetic tree of about `entries` empty files and directories below root.
+    Directories are created breadth first, up to fanout per directory and depth levels;
+    files are spread uniformly over them. Returns the generated directory and file names.
+    """
+    rng = random.Random(seed)
+    names = NameGenerator(rng, vocabulary_size, zipf)
+    dir_budget = max(1, entries // (files_per_dir + 1))
+    dirs = [root]
+    dir_names = []
+    frontier = deque([(root, 0)])
+    while frontier and len(dirs) <= dir_budget:
+        parent, level = frontier.popleft()
+        if level >= depth:
+            continue
+        for _ in range(rng.randint(1, fanout)):
+            if len(dirs) > dir_budget:
+                break
+            name = names.dir_name()
+            path = os.path.join(parent, name)
+            if os.path.exists(path):
+                continue
+            os.mkdir(path)
+            dirs.append(path)
+            dir_names.append(name)
+            frontier.append((path, level + 1))
+
+    file_names = []
+    for _ in range(entries - len(dir_names)):
+        name = names.file_name()
+        path = os.path.join(rng.choice(dirs), name)
+        try:
+            with open(path, "x"):
+                pass
+        except OSError:  # Name already taken in that directory
+            continue
+        file_names.append(name)
+    return dir_names, file_names
+
+
+def keystroke_terms(rng, names, sequences):
+    """
+    Terms typed while looking for `sequences` names picked from names: every
+    prefix of the target, one keystroke at a time, as the launcher sees them.
+    """
+    terms = []
+    for name in rng.sample(names, min(sequences, len(names))):
+        target = os.path.splitext(name)[0][:12]
+        terms.append([target[:end] for end in range(1, len(target) + 1)])
+    return terms
+
+
+def latency_stats(samples):
+    """Summary of latency samples in milliseconds"""
+    samples = sorted(samples)
+    cuts = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(cuts[49], 3),
+        "p95_ms": round(cuts[94], 3),
+        "p99_ms": round(cuts[98], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def time_queries(function, sequences, reset):
+    samples = []
+    for sequence in sequences:
+        reset()
+        for term in sequence:
+            start = time.perf_counter()
+            function(term)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spotlight Clone benchmark")
+    parser.add_argument("--entries", type=int, default=100_000, help="Entries in the synthetic tree (10k to 5M)")
+    parser.add_argument("--depth", type=int, default=6, help="Maximum directory depth")
+    parser.add_argument("--fanout", type=int, default=8, help="Maximum subdirectories per directory")
+    parser.add_argument("--files-per-dir", type=int, default=20, help="Average files per directory")
+    parser.add_argument("--vocabulary", type=int, default=5000, help="Distinct words used in names")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of the word distribution")
+    parser.add_argument("--sequences", type=int, default=200, help="Keystroke sequences per search function")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Crawler threads")
+    parser.add_argument("--trigram", action="store_true", help="Also build the trigram index")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the query cache")
+    parser.add_argument("--tree", type=str, help="Reuse (or create and keep) the synthetic tree in this directory")
+    parser.add_argument("--output", type=str, help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="spotlight-bench-")
+    os.environ["SPOTLIGHT_DATA_DIR"] = scratch
+    # Imported only now, so they pick up the scratch data directory
+    import indexer
+    import search
+
+    try:
+        tree = args.tree or os.path.join(scratch, "tree")
+        rng = random.Random(args.seed)
+        start = time.perf_counter()
+        if args.tree and os.path.isdir(tree):
+            dir_names = []
+            file_names = []
+            for _, dirs, files in os.walk(tree):
+                dir_names += dirs
+                file_names += files
+            generated = False
+        else:
+            os.makedirs(tree, exist_ok=True)
+            dir_names, file_names = generate_tree(tree, args.entries, args.depth, args.fanout,
+                                                  args.files_per_dir, args.vocabulary, args.zipf, args.seed)
+            generated = True
+        generate_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexer.build_index(tree, workers=args.workers, trigram=args.trigram, ignore=False)
+        build_seconds = time.perf_counter() - start
+        with sqlite3.connect(indexer.DB_PATH) as conn:
+            indexed = conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+        if args.no_cache:
+            search.query_cache = search.QueryCache(0)
+        fuzzy = search.SEARCH_BACKEND == "fuzzy" and search.np is not None
+        if fuzzy:
+            # Searches fall back to FTS until the store is loaded: measure the store itself
+            while not search.fuzzy_store(search.DB_PATH).ready():
+                time.sleep(0.05)
+        def reset():
+            search.query_cache.entries.clear()
+
+        with sqlite3.connect(indexer.APPLICATION_DB_PATH) as conn:
+            app_names = [row[0] for row in conn.execute("SELECT name FROM applications")]
+        workloads = {
+            "search_files": (search.SearchInFiles.search_files, file_names),
+            "search_dirs": (search.SearchInFiles.search_dirs, dir_names),
+            "search_application": (search.SearchInFiles.search_application, app_names),
+        }
+        queries = {}
+        for name, (function, targets) in workloads.items():
+            sequences = keystroke_terms(rng, targets, args.sequences)
+            function(sequences[0][0])  # Open the connection outside the measurement
+            queries[name] = latency_stats(time_queries(function, sequences, reset))
+
+        results = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            "environment": {
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "search_backend": search.SEARCH_BACKEND,
+            },
+            "tree": {"generated": generated, "seconds": round(generate_seconds, 3),
+                     "directories": len(dir_names), "files": len(file_names)},
+            "build": {
+                "entries": indexed,
+                "seconds": round(build_seconds, 3),
+                "rows_per_s": round(indexed / max(build_seconds, 1e-9)),
+                "db_bytes": os.path.getsize(indexer.DB_PATH),
+            },
+            "queries": queries,
+        }
+        if fuzzy:
+            results["fuzzy_store"] = search.fuzzy_store(search.DB_PATH).stats()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+import socket
+import subprocess
+import sys
+from pathlib import Path
+
+# Kept free of GTK imports so a hotkey can summon the resident launcher instantly:
+#   python3 client.py
+
+BASE_DIR = Path(__file__).resolve().parent
+
+def socket_path():
+    """The launcher's socket: in XDG_RUNTIME_DIR, else in a private directory of the user's cache"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, f"spotlight-{os.getuid()}.sock")
+    # Never a shared directory like /tmp, where another user could own or listen on the path
+    directory = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "spotlight")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    os.chmod(directory, 0o700)
+    return os.path.join(directory, "launcher.sock")
+
+SOCKET_PATH = socket_path()
+
+def signal_resident(command="show"):
+    """
+    Send a command ("show", "quit" or "stats") to the resident launcher.
+    Returns False if no resident launcher is listening.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1)
+            sock.connect(SOCKET_PATH)
+            sock.sendall(command.encode())
+        return True
+    except OSError:
+        return False
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "show"
+    if not signal_resident(command) and command == "show":
+        # First use: start the launcher, which stays resident from now on
+        subprocess.Popen([sys.executable, str(BASE_DIR / "app.py")], start_new_session=True)
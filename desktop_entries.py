@@ -0,0 +1,154 @@
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PARSE_WORKERS = 8
+# Exec field codes (%f, %U, %i, ...) are expanded by launchers; we launch without arguments
+FIELD_CODE_RE = re.compile(r"%[fFuUdDnNickvm]")
+
+
+def application_dirs():
+    """The XDG `applications` directories, most important first"""
+    data_home = os.environ.get("XDG_DATA_HOME") or str(Path.home() / ".local/share")
+    data_dirs = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+    dirs = [data_home] + [d for d in data_dirs.split(":") if d]
+    return [os.path.join(d, "applications") for d in dirs]
+
+
+def find_desktop_files():
+    """
+    Return {desktop file id: (path, mtime_ns)} for every .desktop file.
+    As in the XDG spec, subdirectories turn into dashes in the id and the
+    first directory providing an id wins.
+    """
+    found = {}
+    for directory in application_dirs():
+        for root, dirs, files in os.walk(directory):
+            for f in files:
+                if not f.endswith(".desktop"):
+                    continue
+                path = os.path.join(root, f)
+                desktop_id = os.path.relpath(path, directory).replace(os.sep, "-")
+                if desktop_id in found:
+                    continue
+                try:
+                    found[desktop_id] = (path, os.stat(path).st_mtime_ns)
+                except OSError:
+                    pass
+    return found
+
+
+def parse_desktop_file(path):
+    """
+    Parse the [Desktop Entry] group of a .desktop file.
+    Returns (name, generic_name, keywords, command, icon, visible), or None
+    for files that are not launchable applications.
+    """
+    fields = {}
+    in_entry = False
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("["):
+                    if in_entry:
+                        break
+                    in_entry = line == "[Desktop Entry]"
+                    continue
+                if in_entry and "=" in line:
+                    key, value = line.split("=", 1)
+                    fields.setdefault(key.strip(), value.strip())
+    except OSError:
+        return None
+
+    if fields.get("Type") != "Application" or not fields.get("Name") or not fields.get("Exec"):
+        return None
+    command = FIELD_CODE_RE.sub("", fields["Exec"]).replace("%%", "%").strip()
+    visible = fields.get("NoDisplay") != "true" and fields.get("Hidden") != "true"
+    return (
+        fields["Name"].lower(),
+        fields.get("GenericName", ""),
+        fields.get("Keywords", "").replace(";", " ").strip(),
+        command,
+        fields.get("Icon", ""),
+        int(visible),
+    )
+
+
+def build_catalogue(db_path, custom_applications):
+    """
+    Refresh the `applications` table of db_path from the installed .desktop files.
+    Parse results are cached in `desktop_files` keyed by path and mtime, so only
+    new or changed files are parsed (in parallel). The FTS table is only rebuilt
+    when something changed. custom_applications ({name: command}) fill in
+    shortcuts that no installed application provides; the last list is kept
+    in `custom_applications`, so editing it also counts as a change.
+    """
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS desktop_files (
+            id TEXT PRIMARY KEY,
+            path TEXT,
+            mtime_ns INTEGER,
+            name TEXT,
+            generic_name TEXT,
+            keywords TEXT,
+            command TEXT,
+            icon TEXT,
+            visible INTEGER
+        )
+    """)
+    cursor.execute("CREATE TABLE IF NOT EXISTS custom_applications (name TEXT PRIMARY KEY, command TEXT)")
+    cached = {row[0]: row[1:] for row in cursor.execute("SELECT id, path, mtime_ns FROM desktop_files")}
+    found = find_desktop_files()
+
+    removed = [desktop_id for desktop_id in cached if desktop_id not in found]
+    changed = {desktop_id: info for desktop_id, info in found.items() if cached.get(desktop_id) != info}
+    with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as pool:
+        parsed = list(pool.map(parse_desktop_file, [path for path, _ in changed.values()]))
+
+    cursor.executemany("DELETE FROM desktop_files WHERE id = ?", [(desktop_id,) for desktop_id in removed])
+    cursor.executemany(
+        "INSERT OR REPLACE INTO desktop_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(desktop_id, path, mtime_ns) + (fields or (None, "", "", "", "", 0))
+         for (desktop_id, (path, mtime_ns)), fields in zip(changed.items(), parsed)]
+    )
+
+    custom = {name.lower(): command for name, command in custom_applications.items()}
+    custom_changed = dict(cursor.execute("SELECT name, command FROM custom_applications")) != custom
+    if custom_changed:
+        cursor.execute("DELETE FROM custom_applications")
+        cursor.executemany("INSERT INTO custom_applications VALUES (?, ?)", custom.items())
+
+    has_table = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'applications'").fetchone()
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(applications)")]
+    if removed or changed or custom_changed or not has_table or "keywords" not in columns:
+        cursor.execute("DROP TABLE IF EXISTS applications")
+        cursor.execute("""
+            CREATE VIRTUAL TABLE applications
+            USING fts5(name, command, generic_name, keywords, icon UNINDEXED)
+        """)
+        cursor.execute("""
+            INSERT INTO applications (name, command, generic_name, keywords, icon)
+            SELECT name, command, generic_name, keywords, icon
+            FROM desktop_files
+            WHERE visible AND name IS NOT NULL
+            GROUP BY name
+        """)
+        installed = {row[0] for row in cursor.execute("SELECT name FROM applications")}
+        cursor.executemany(
+            "INSERT INTO applications (name, command, generic_name, keywords, icon) VALUES (?, ?, '', '', '')",
+            [(name, command) for name, command in custom.items() if name not in installed]
+        )
+    conn.commit()
+    total = cursor.execute("SELECT count(*) FROM applications").fetchone()[0]
+    conn.close()
+    print(f"Application catalogue: {total} applications, {len(changed)} desktop files parsed, "
+          f"{len(found) - len(changed)} cached, in {(time.perf_counter() - start) * 1000:.0f} ms")
@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from gi.repository import GdkPixbuf
+
+BASE_DIR = Path(__file__).resolve().parent
+ICON_SIZE = 23
+ICON_CACHE_SIZE = 64  # Decoded pixbufs kept; larger than the bundled icon set
+
+FOLDER_ICON = 'assets/folder.png'
+DEFAULT_FILE_ICON = 'assets/file_icons/txt.png'
+DEFAULT_APP_ICON = 'assets/app_icons/app.png'
+PRELOAD_DIRS = ('assets/file_icons', 'assets/app_icons')
+
+# Lowercase extension -> icon
+FILE_ICONS = {
+    '.py': 'assets/file_icons/python.png',
+    '.txt': 'assets/file_icons/txt.png',
+    '.cpp': 'assets/file_icons/cpp.png',
+    '.c': 'assets/file_icons/cpp.png',
+    '.png': 'assets/file_icons/image.png',
+    '.jpg': 'assets/file_icons/image.png',
+    '.jpeg': 'assets/file_icons/image.png',
+    '.pdf': 'assets/file_icons/pdf.png',
+    '.json': 'assets/file_icons/json.png',
+    '.html': 'assets/file_icons/html.png',
+    '.js': 'assets/file_icons/js.png',
+    '.vue': 'assets/file_icons/vue.png',
+}
+
+# Application name (as stored in applications.db) -> icon
+APP_ICONS = {
+    'firefox': 'assets/app_icons/firefox.png',
+    'visual studio code': 'assets/app_icons/visual-studio-code.png',
+    'whatsapp': 'assets/app_icons/whatsapp.png',
+    'emacs': 'assets/app_icons/emacs.png',
+    'appunti': 'assets/app_icons/appunti.png',
+    'spotify': 'assets/app_icons/spotify.png',
+    'overleaf': 'assets/app_icons/overleaf.png',
+    'zoom': 'assets/app_icons/zoom.png',
+    'gaia-app': 'assets/app_icons/gaia.png',
+    'gaia-web': 'assets/app_icons/gaia.png',
+    'moodle': 'assets/app_icons/moodle.png',
+    'telegram': 'assets/app_icons/telegram.png',
+    'postman': 'assets/app_icons/postman.png',
+    'gmail': 'assets/app_icons/gmail.png',
+    'studio': 'assets/app_icons/appunti.png',
+    'notetom': 'assets/app_icons/notetom.png',
+    'intellij': 'assets/app_icons/intellij.png',
+    'android studio': 'assets/app_icons/android-studio.png',
+}
+
+
+def file_icon_path(filename):
+    """Icon for a file name, resolved with a single extension lookup"""
+    return FILE_ICONS.get(os.path.splitext(filename)[1].lower(), DEFAULT_FILE_ICON)
+
+
+def app_icon_path(app_name):
+    return APP_ICONS.get(app_name, DEFAULT_APP_ICON)
+
+
+class IconStore:
+    """
+    Decoded and scaled pixbufs for result rows, in a bounded LRU.
+    preload() decodes every bundled icon in a background thread at startup,
+    so rendering results while typing never touches the disk or the decoder.
+    """
+    def __init__(self, size=ICON_SIZE, maxsize=ICON_CACHE_SIZE):
+        self.size = size
+        self.maxsize = maxsize
+        self.pixbufs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def preload(self):
+        threading.Thread(target=self._preload, daemon=True).start()
+
+    def _preload(self):
+        paths = [FOLDER_ICON]
+        for directory in PRELOAD_DIRS:
+            paths += sorted(f"{directory}/{name}" for name in os.listdir(BASE_DIR / directory)
+                            if name.endswith('.png'))
+        for img_path in paths:
+            try:
+                self.get(img_path)
+            except Exception as e:
+                print(f"Error loading icon {img_path}: {e}")
+
+    def get(self, img_path):
+        """Pixbuf for an icon path relative to the project (or absolute)"""
+        with self.lock:
+            pixbuf = self.pixbufs.get(img_path)
+            if pixbuf is not None:
+                self.pixbufs.move_to_end(img_path)
+                return pixbuf
+
+        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(str(BASE_DIR / img_path), self.size, self.size)
+        with self.lock:
+            self.pixbufs[img_path] = pixbuf
+            while len(self.pixbufs) > self.maxsize:
+                self.pixbufs.popitem(last=False)
+        return pixbuf
+
+    def file_icon(self, filename):
+        return self.get(file_icon_path(filename))
+
+    def app_icon(self, app_name):
+        return self.get(app_icon_path(app_name))
+
+    def folder_icon(self):
+        return self.get(FOLDER_ICON)
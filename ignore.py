@@ -0,0 +1,236 @@
+import os
+import re
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+# Extra global patterns, one per line in .gitignore syntax, applied below every indexed root
+GLOBAL_IGNORE_FILE = BASE_DIR / "spotlight.ignore"
+# Per-directory files, applied to the directory they live in and everything below it
+IGNORE_FILES = (".gitignore", ".spotlightignore")
+
+DEFAULT_IGNORE_PATTERNS = (
+    ".git/",
+    ".hg/",
+    ".svn/",
+    "node_modules/",
+    ".cache/",
+    "__pycache__/",
+    ".venv/",
+    "venv/",
+    ".tox/",
+    ".mypy_cache/",
+    ".pytest_cache/",
+    "build/",
+    "dist/",
+    "*.egg-info/",
+    "*.pyc",
+)
+
+
+class Rule:
+    """One gitignore pattern, relative to the directory of the file it came from"""
+    __slots__ = ("base", "regex", "negate", "dir_only", "anchored")
+
+    def __init__(self, base, pattern):
+        self.negate = pattern.startswith("!")
+        pattern = pattern[1:] if self.negate else pattern
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if pattern.startswith("**/") and "/" not in pattern[3:]:
+            pattern = pattern[3:]
+        # Like git, a slash anywhere but at the end anchors the pattern to base
+        self.anchored = "/" in pattern
+        self.base = base
+        self.regex = re.compile(translate(pattern.lstrip("/")))
+
+    def matches(self, path, name, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+        if self.anchored:
+            return bool(self.regex.match(path[len(self.base) + 1:]))
+        return bool(self.regex.match(name))
+
+
+def translate(pattern):
+    """
+    Regex for a gitignore glob. Unlike fnmatch, `*`, `?` and `[...]` never
+    match a slash; `**/` matches zero or more directories and a final `/**`
+    everything inside a directory.
+    """
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            j = i
+            while j < n and pattern[j] == "*":
+                j += 1
+            # "**" only spans directories as a whole path component, elsewhere it is a plain "*"
+            if j - i > 1 and (i == 0 or pattern[i - 1] == "/") and (j == n or pattern[j] == "/"):
+                if j == n:
+                    parts.append(".*")
+                else:
+                    parts.append("(?:.*/)?")
+                    j += 1
+            else:
+                parts.append("[^/]*")
+            i = j
+        elif c == "?":
+            parts.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = i + 1
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:  # No closing bracket: a literal "["
+                parts.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1:j].replace("\\", "\\\\")
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            parts.append(f"(?!/)[{body}]")
+            i = j + 1
+        elif c == "\\" and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return f"(?s:{''.join(parts)})\\Z"
+
+
+class IgnoreStats:
+    """Counts of what the ignore rules kept out of the index, shared by the crawler threads"""
+    def __init__(self, count_pruned=False):
+        self.count_pruned = count_pruned
+        self.dirs = 0
+        self.files = 0
+        self.below = 0  # Entries inside pruned directories, only counted with count_pruned
+        self.lock = threading.Lock()
+
+    def add(self, dirs, files, below=0):
+        with self.lock:
+            self.dirs += dirs
+            self.files += files
+            self.below += below
+
+    @property
+    def entries(self):
+        return self.dirs + self.files + self.below
+
+
+class IgnoreRules:
+    """
+    The rules in effect for one directory: the global patterns plus the ignore
+    files of the directory and its ancestors, most specific last. As in git,
+    the last matching pattern wins and `!pattern` re-includes a path.
+    """
+    def __init__(self, rules, stats=None):
+        self.rules = rules
+        self.stats = stats or IgnoreStats()
+        # Without negations the result does not depend on order, so every
+        # unanchored pattern collapses into one regex per kind
+        self.ordered = any(rule.negate for rule in rules)
+        unanchored = [rule for rule in rules if not rule.anchored]
+        self.any_re = self.combine(rule for rule in unanchored if not rule.dir_only)
+        self.dir_re = self.combine(rule for rule in unanchored if rule.dir_only)
+        self.anchored = [rule for rule in rules if rule.anchored]
+
+    @staticmethod
+    def combine(rules):
+        patterns = [rule.regex.pattern for rule in rules]
+        return re.compile("|".join(patterns)) if patterns else None
+
+    @classmethod
+    def load(cls, root_dir, patterns=DEFAULT_IGNORE_PATTERNS, stats=None):
+        """
+        The rules root_dir inherits: patterns and the global ignore file.
+        Like every directory, root_dir adds its own ignore files when listed.
+        """
+        rules = [Rule(root_dir, pattern) for pattern in patterns]
+        rules += read_ignore_file(GLOBAL_IGNORE_FILE, root_dir)
+        return cls(rules, stats)
+
+    def for_dir(self, path, names=None):
+        """
+        Rules for the contents of directory path. names, the directory's listing,
+        avoids probing for ignore files that are not there.
+        """
+        extra = []
+        for ignore_file in IGNORE_FILES:
+            if names is None or ignore_file in names:
+                extra += read_ignore_file(os.path.join(path, ignore_file), path)
+        return IgnoreRules(self.rules + extra, self.stats) if extra else self
+
+    def ignored(self, path, name, is_dir):
+        if self.ordered:
+            result = False
+            for rule in self.rules:
+                if rule.matches(path, name, is_dir):
+                    result = not rule.negate
+            return result
+        if self.any_re and self.any_re.match(name):
+            return True
+        if is_dir and self.dir_re and self.dir_re.match(name):
+            return True
+        return any(rule.matches(path, name, is_dir) for rule in self.anchored)
+
+    def for_path(self, root_dir, path):
+        """
+        Rules inherited by path, which lies below root_dir (for which these
+        rules were loaded), or None if path or one of its ancestors is ignored.
+        """
+        rules = self.for_dir(root_dir)
+        current = root_dir
+        parts = os.path.relpath(path, root_dir).split(os.sep)
+        for i, part in enumerate(parts):
+            if part in (".", ""):
+                continue
+            child = os.path.join(current, part)
+            is_dir = i < len(parts) - 1 or os.path.isdir(child)
+            if rules.ignored(child, part, is_dir):
+                return None
+            if i < len(parts) - 1:
+                rules = rules.for_dir(child)
+            current = child
+        return rules
+
+
+def read_ignore_file(path, base):
+    """Parse a .gitignore-style file into rules relative to base"""
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    rules = []
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("\\"):
+            line = line[1:]
+        rules.append(Rule(base, line))
+    return rules
+
+
+def count_tree(path):
+    """Number of entries below path, counted without touching the index"""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    total += 1
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+        except OSError:
+            pass
+    return total
@@ -1,89 +1,968 @@
 import sqlite3
 import os
+import re
 import argparse
+import mmap
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
 
-DB_PATH = "spotlight_index.db"
-APPLICATION_DB_PATH = "applications.db"
-
-application_list = {'firefox':'firefox',
-    'VS Code':'code',
-    'WhatsApp': 'whatsapp-linux-app',
-    'Spotify': 'spotify',
-    'Zoom':'zoom',
-    'Appunti':'emacs /home/$USER/università/appuntiLatex/',
-    'OverLeaf':'firefox -new-window https://www.overleaf.com/project',
-    'Moodle': 'firefox -new-window https://webapps.unitn.it/gestionecorsi/',
-    'Telegram':'telegram-desktop',
-    'Postman':'postman',
-    'Gmail': 'firefox -new-window https://mail.google.com/mail/u/0/#inbox',
-    'Studio': 'firefox -new-window https://webapps.unitn.it/gestionecorsi/ https://www.overleaf.com/project',
-    'NoteTom': 'firefox --new-window https://notetom.onrender.com/',
-    'Intellij': 'intellij-idea-ultimate',
-    'Android Studio': 'android-studio'
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+from desktop_entries import build_catalogue
+from ignore import IgnoreRules, IgnoreStats, count_tree
+from tree import ROOT_TYPE, directory_paths, path_id
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.environ.get("SPOTLIGHT_DATA_DIR") or BASE_DIR)  # Where the databases live
+DB_PATH = str(DATA_DIR / "spotlight_index.db")
+APPLICATION_DB_PATH = str(DATA_DIR / "applications.db")
+# Every named root has its own database (shard); "default" is DB_PATH, the others live here
+SHARD_DIR = DATA_DIR / "indexes"
+DEFAULT_SHARD = "default"
+SHARD_NAME_RE = re.compile(r"[A-Za-z0-9][\w.-]*")
+
+WATCH_QUIET_PERIOD = 0.5  # Seconds without new events before a batch is flushed
+WATCH_MAX_DELAY = 5.0  # Longest time an event may wait while a storm keeps going
+
+DEFAULT_BATCH_SIZE = 50000  # Rows per executemany chunk and per commit during a build
+CACHE_PRAGMAS = (
+    "PRAGMA cache_size = -262144",  # 256 MiB
+    "PRAGMA temp_store = MEMORY",
+)
+# Only for shadow databases, which nothing else reads until they are complete
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA synchronous = OFF",
+    *CACHE_PRAGMAS,
+)
+SHADOW_SUFFIX = ".building"  # Rebuilds write to <database>.building, then publish it
+WRITE_TIMEOUT = 60.0  # Seconds a writer waits for another (watcher, rescan, publishing a rebuild)
+DEFAULT_WORKERS = os.cpu_count() or 4  # Crawler threads; raise it for high-latency (NFS) homes
+WALK_CHUNK_SIZE = 1000  # Rows per chunk handed from a crawler thread to the writer
+WALK_QUEUE_SIZE = 64  # Chunks buffered between the crawlers and the writer
+# Content indexing (--content): text-like files only, bounded per file
+CONTENT_EXTENSIONS = {
+    '.txt', '.md', '.rst', '.tex', '.bib', '.csv', '.log',
+    '.py', '.c', '.h', '.cpp', '.hpp', '.java', '.kt', '.go', '.rs', '.js', '.ts', '.vue',
+    '.html', '.css', '.json', '.xml', '.yaml', '.yml', '.toml', '.ini', '.cfg', '.sh', '.sql',
 }
+CONTENT_MAX_SIZE = 8 * 2**20  # Larger files are skipped (logs, dumps, generated code)
+CONTENT_MAX_BYTES = 2**20  # Only the head of a file is indexed
+CONTENT_CHUNK_SIZE = 256  # Files handed to an extraction process at a time
+CONTENT_SLICE_CHUNKS = 2  # Chunks in flight per extraction process
+CONTENT_BATCH_BYTES = 32 * 2**20  # Extracted text buffered per insert and commit
 
-def build_index(root_dir):
-    conn_files = sqlite3.connect(DB_PATH)
-    cursor = conn_files.cursor()
+# Full-text name index per entry type, so typed searches never filter FTS hits
+NAME_TABLES = {"file": "file_names", "directory": "dir_names"}
+INSERT_ENTRY_SQL = "INSERT INTO entries (id, parent, name, type, ext, size, mtime_ns, inode) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+# Live databases: in WAL mode the watcher and rescans never block the launcher's readers
+DEFAULT_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+)
+
+# Custom shortcuts; installed applications are discovered from .desktop files
+application_list = {
+    'firefox': 'firefox',
+    'visual studio code': 'code',
+    'whatsapp': 'whatsapp-linux-app',
+    'spotify': 'spotify',
+    'zoom': 'zoom',
+    'appunti': 'emacs /home/$USER/università/appuntiLatex/',
+    'gaia-web': 'firefox -new-window https://gaiaassistant.netlify.app/',
+    'overleaf': 'firefox -new-window https://www.overleaf.com/project',
+    'moodle': 'firefox -new-window https://webapps.unitn.it/gestionecorsi/',
+    'telegram': 'telegram-desktop',
+    'postman': 'postman',
+    'gmail': 'firefox -new-window https://mail.google.com/mail/u/0/#inbox',
+    'studio': 'firefox -new-window https://webapps.unitn.it/gestionecorsi/ https://www.overleaf.com/project',
+    'notetom': 'firefox --new-window https://notetom.onrender.com/',
+    'intellij': 'intellij-idea-ultimate',
+    'android studio': 'android-studio',
+}
+
+def shard_path(name=DEFAULT_SHARD):
+    """Database file of the named root; raises ValueError for names that are not plain file names"""
+    if name == DEFAULT_SHARD:
+        return DB_PATH
+    if not SHARD_NAME_RE.fullmatch(name):
+        raise ValueError(f"invalid index name: {name!r} (letters, digits, '.', '_' and '-' only)")
+    return str(SHARD_DIR / f"{name}.db")
+
+def list_shards():
+    """{name: database path} of every named root that has been indexed"""
+    shards = {DEFAULT_SHARD: DB_PATH} if os.path.exists(DB_PATH) else {}
+    if SHARD_DIR.is_dir():
+        for file in sorted(SHARD_DIR.glob("*.db")):
+            shards[file.stem] = str(file)
+    return shards
+
+def entry_row(path, name, is_dir, st, descend=False):
+    """
+    The crawler's (path, name, type, ext, size, mtime_ns, inode) row for a stat
+    result. Directories that are descended into also keep their inode: with the
+    mtime it tells rescan whether they changed since they were listed.
+    """
+    if is_dir:
+        return path, name, "directory", None, st.st_size, st.st_mtime_ns, st.st_ino if descend else None
+    return path, name, "file", os.path.splitext(name)[1].lower(), st.st_size, st.st_mtime_ns, None
+
+def path_row(path):
+    """The crawler row of an existing path, or None if it vanished"""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    is_dir = os.path.isdir(path)
+    return entry_row(path, os.path.basename(path), is_dir, st, is_dir and not os.path.islink(path))
+
+def list_dir(path, rules=None):
+    """
+    List one directory with os.scandir. Returns its crawler rows, the
+    subdirectories to descend into and the ignore rules its subdirectories
+    inherit; rows is None if the directory cannot be read. The type comes
+    from the DirEntry, size and mtime from an lstat. Like os.walk, symlinked
+    directories are listed but not descended into. With rules (inherited from
+    the parent), ignored entries are left out and ignored directories are
+    never descended into.
+    """
+    entries = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append((entry, is_dir))
+    except OSError:
+        return None, [], rules
+
+    if rules is not None:
+        rules = rules.for_dir(path, {entry.name for entry, _ in entries})
+    rows = []
+    subdirs = []
+    pruned_dirs = pruned_files = below = 0
+    for entry, is_dir in entries:
+        if rules is not None and rules.ignored(entry.path, entry.name, is_dir):
+            if is_dir:
+                pruned_dirs += 1
+                if rules.stats.count_pruned and not entry.is_symlink():
+                    below += count_tree(entry.path)
+            else:
+                pruned_files += 1
+            continue
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue  # Vanished since the listing
+        descend = is_dir and not entry.is_symlink()
+        rows.append(entry_row(entry.path, entry.name, is_dir, st, descend))
+        if descend:
+            subdirs.append(entry.path)
+    if pruned_dirs or pruned_files:
+        rules.stats.add(pruned_dirs, pruned_files, below)
+    return rows, subdirs, rules
+
+def scan_tree(top, stop=None, rules=None):
+    """
+    Yield chunks of crawler rows for everything below top, every directory
+    before its contents. rules are the ignore rules top inherits.
+    """
+    rows = []
+    stack = [(top, rules)]
+    while stack and not (stop and stop.is_set()):
+        path, rules = stack.pop()
+        dir_rows, subdirs, child_rules = list_dir(path, rules=rules)
+        if dir_rows is None:
+            continue
+        rows.extend(dir_rows)
+        stack.extend((subdir, child_rules) for subdir in subdirs)
+        if len(rows) >= WALK_CHUNK_SIZE:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+def walk_parallel(root_dir, workers=DEFAULT_WORKERS, rules=None):
+    """
+    Yield chunks of crawler rows, as scan_tree does, for everything below
+    root_dir. The top-level subtrees are crawled by a pool of worker threads,
+    which stream their chunks to the caller (the single SQLite writer) through
+    a bounded queue. Every subtree's chunks stay in order, so a directory
+    still arrives before its contents.
+    """
+    top_rows, subtrees, rules = list_dir(root_dir, rules=rules)
+    if top_rows is None:
+        print(f"Cannot read {root_dir}")
+        return
+    yield top_rows
+
+    chunks = queue.Queue(maxsize=WALK_QUEUE_SIZE)
+    stop = threading.Event()
+    done = object()
+
+    def crawl(subtree):
+        for chunk in scan_tree(subtree, stop, rules):
+            chunks.put(chunk)
+
+    def crawl_all():
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(crawl, subtree) for subtree in subtrees]:
+                error = future.exception()
+                if error:
+                    print(f"Error while crawling: {error}")
+        chunks.put(done)
 
-    # Recreate table to include a type column
-    cursor.execute("DROP TABLE IF EXISTS entries")
-    cursor.execute("CREATE VIRTUAL TABLE entries USING fts5(path, name, type)")
+    threading.Thread(target=crawl_all, daemon=True).start()
+    try:
+        while (chunk := chunks.get()) is not done:
+            yield chunk
+    finally:
+        # If the writer stops early, let the crawlers wind down instead of
+        # blocking forever on a full queue
+        stop.set()
+        while chunk is not done:
+            chunk = chunks.get()
 
-    for root, dirs, files in os.walk(root_dir):
-        for d in dirs:
-            full_path = os.path.join(root, d)
-            cursor.execute("INSERT INTO entries (path, name, type) VALUES (?, ?, ?)",
-                           (full_path, d, "directory"))
-        for f in files:
-            full_path = os.path.join(root, f)
-            cursor.execute("INSERT INTO entries (path, name, type) VALUES (?, ?, ?)",
-                           (full_path, f, "file"))
+class TreeWriter:
+    """
+    Turns crawler rows into `entries` rows: assigns ids itself and replaces
+    every path by the id of its parent directory. Directory ids are remembered
+    as their rows go by; other parents are looked up in the index once.
+    """
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.next_id = cursor.execute("SELECT coalesce(max(id), 0) + 1 FROM entries").fetchone()[0]
+        self.dir_ids = {}
 
-    conn_application = sqlite3.connect(APPLICATION_DB_PATH)
-    cursor_application = conn_application.cursor()
+    def add_root(self, root_dir):
+        """Insert the row of an indexed root, or None if it cannot be stat-ed"""
+        try:
+            st = os.stat(root_dir)
+        except OSError:
+            return None
+        root_id = self.next_id
+        self.next_id += 1
+        self.cursor.execute(INSERT_ENTRY_SQL, (root_id, None, root_dir, ROOT_TYPE, None,
+                                               st.st_size, st.st_mtime_ns, st.st_ino))
+        self.dir_ids[root_dir] = root_id
+        return root_id
+
+    def parent_id(self, path):
+        parent = os.path.dirname(path)
+        entry_id = self.dir_ids.get(parent)
+        if entry_id is None:
+            found = path_id(self.cursor, parent)
+            if found is not None:
+                entry_id = self.dir_ids[parent] = found[0]
+        return entry_id
+
+    def rows(self, rows):
+        """`entries` rows for crawler rows; rows whose parent is not indexed are dropped"""
+        converted = []
+        for path, name, entry_type, ext, size, mtime_ns, inode in rows:
+            parent = self.parent_id(path)
+            if parent is None:
+                continue
+            entry_id = self.next_id
+            self.next_id += 1
+            if entry_type == "directory":
+                self.dir_ids[path] = entry_id
+            converted.append((entry_id, parent, name, entry_type, ext, size, mtime_ns, inode))
+        return converted
+
+def insert_entries(cursor, rows, writer=None):
+    """
+    Insert crawler rows from an incremental update, through writer if given
+    (to share its directory ids across calls). Triggers keep the name indexes
+    in sync. Returns the number of rows inserted.
+    """
+    converted = (writer or TreeWriter(cursor)).rows(rows)
+    cursor.executemany(INSERT_ENTRY_SQL, converted)
+    return len(converted)
+
+def delete_entries(cursor, entry_id, recursive=False, path=None):
+    """
+    Delete an entry, and everything below it when recursive, together with
+    the indexed content of the removed files (found through path, if given).
+    Triggers keep the name indexes in sync.
+    """
+    if recursive:
+        cursor.execute("""
+            WITH RECURSIVE below(id) AS (
+                SELECT ?
+                UNION ALL
+                SELECT e.id FROM entries e JOIN below ON e.parent = below.id
+            )
+            DELETE FROM entries WHERE id IN below
+        """, (entry_id,))
+    else:
+        cursor.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+    if path is not None and has_content_index(cursor):
+        # The text cannot be removed from the contentless table without the file's
+        # old contents; dropping the content_files row hides it until the next --content run
+        prefix = path.rstrip(os.sep) + os.sep
+        if recursive:
+            cursor.execute("DELETE FROM content_files WHERE path = ? OR (path > ? AND path < ?)",
+                           (path, prefix, prefix[:-1] + chr(ord(os.sep) + 1)))
+        else:
+            cursor.execute("DELETE FROM content_files WHERE path = ?", (path,))
+
+def create_entries(cursor):
+    """
+    Create `entries`, where every row refers to its directory by id instead of
+    storing a full path, and one external-content FTS5 table per type indexing
+    only the names (their text is read back from `entries`, not stored twice).
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            parent INTEGER,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            ext TEXT,
+            size INTEGER,
+            mtime_ns INTEGER,
+            inode INTEGER
+        )
+    """)
+    for table in NAME_TABLES.values():
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(name, content='entries', content_rowid='id')")
+
+def create_entries_index(cursor):
+    """
+    Create the (parent, name) index, used to list directories and to resolve
+    paths, and the triggers keeping the name indexes in sync. Bulk loads call
+    it after the rows are in, which is faster than maintaining both row by row.
+    """
+    cursor.execute("CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent, name)")
+    for entry_type, table in NAME_TABLES.items():
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON entries WHEN new.type = '{entry_type}'
+            BEGIN
+                INSERT INTO {table} (rowid, name) VALUES (new.id, new.name);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON entries WHEN old.type = '{entry_type}'
+            BEGIN
+                INSERT INTO {table} ({table}, rowid, name) VALUES ('delete', old.id, old.name);
+            END
+        """)
+
+def schema_is_current(cursor):
+    """False for indexes built before `entries` became a tree of parent ids"""
+    return "parent" in [row[1] for row in cursor.execute("PRAGMA table_info(entries)")]
+
+class BatchWriter:
+    """
+    Writer stage for bulk loads: converts crawler rows through a TreeWriter,
+    inserts them with executemany and commits every batch_size rows,
+    printing the ingest rate.
+    """
+    def __init__(self, conn, batch_size=DEFAULT_BATCH_SIZE, progress=True):
+        self.conn = conn
+        self.tree = TreeWriter(conn.cursor())
+        self.batch_size = batch_size
+        self.progress = progress
+        self.buffer = []
+        self.total = 0
+        self.start = time.perf_counter()
+
+    def write(self, rows):
+        self.buffer.extend(self.tree.rows(rows))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        self.conn.executemany(INSERT_ENTRY_SQL, self.buffer)
+        self.conn.commit()
+        self.total += len(self.buffer)
+        self.buffer = []
+        if self.progress:
+            elapsed = time.perf_counter() - self.start
+            print(f"  {self.total} rows written ({self.total / elapsed:.0f} rows/s)")
+
+    def close(self):
+        """Flush the remaining rows and return the total number written"""
+        self.flush()
+        return self.total
+
+def build_trigram_index(conn):
+    """
+    Build the trigram name index used for substring search. Like the name
+    indexes it reads names from `entries` (external content) and is kept in
+    sync by triggers. Prints the extra size and the build time.
+    """
+    start = time.perf_counter()
+    pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+    conn.execute("""
+        CREATE VIRTUAL TABLE entries_trigram
+        USING fts5(name, content='entries', content_rowid='id', tokenize='trigram')
+    """)
+    conn.execute("INSERT INTO entries_trigram (rowid, name) SELECT id, name FROM entries")
+    conn.execute("""
+        CREATE TRIGGER entries_trigram_insert AFTER INSERT ON entries
+        BEGIN
+            INSERT INTO entries_trigram (rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER entries_trigram_delete AFTER DELETE ON entries
+        BEGIN
+            INSERT INTO entries_trigram (entries_trigram, rowid, name) VALUES ('delete', old.id, old.name);
+        END
+    """)
+    conn.commit()
+    pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    size_mb = (pages_after - pages_before) * page_size / 2**20
+    print(f"Trigram index: {size_mb:.1f} MiB, built in {time.perf_counter() - start:.1f}s")
+
+def has_content_index(cursor):
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'content_files'").fetchone() is not None
+
+def drop_stale_content(cursor):
+    """
+    Drop the content_files rows of files changed since their text was indexed.
+    Editing a file in place leaves its directory's mtime alone, so every
+    content-indexed file is stat-ed. Returns how many rows were dropped.
+    """
+    stale = []
+    for file_id, path, mtime_ns, size in cursor.execute(
+            "SELECT id, path, mtime_ns, size FROM content_files").fetchall():
+        try:
+            st = os.stat(path)
+        except OSError:
+            stale.append((file_id,))
+            continue
+        if st.st_mtime_ns != mtime_ns or st.st_size != size:
+            stale.append((file_id,))
+    cursor.executemany("DELETE FROM content_files WHERE id = ?", stale)
+    return len(stale)
+
+def extract_text(path):
+    """
+    Read the text of one file for the content index, in an extraction process.
+    Returns (path, mtime_ns, size, text), or None for files that are too large,
+    unreadable or binary (a NUL byte in the first block).
+    """
+    try:
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if st.st_size == 0 or st.st_size > CONTENT_MAX_SIZE:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm.find(b"\0", 0, 8192) != -1:
+                    return None
+                data = mm[:CONTENT_MAX_BYTES]
+    except (OSError, ValueError):
+        return None
+    return path, st.st_mtime_ns, st.st_size, data.decode("utf-8", errors="replace")
+
+def build_content_index(conn, root_dir=None, workers=DEFAULT_WORKERS):
+    """
+    Rebuild the content index for the indexed text files (below root_dir, if given).
+    Text goes into a contentless FTS5 table, so it is not stored a second time;
+    content_files maps its rowids back to paths. Extraction runs in a process pool
+    that gets the paths a slice at a time, so besides the batch being inserted
+    only the text of one slice is held in memory. The new tables are
+    built next to the old ones and replace them in one transaction, so content
+    searches keep working meanwhile.
+    """
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS content_new")
+    cursor.execute("DROP TABLE IF EXISTS content_files_new")
+    cursor.execute("CREATE VIRTUAL TABLE content_new USING fts5(text, content='')")
+    cursor.execute("CREATE TABLE content_files_new (id INTEGER PRIMARY KEY, path TEXT UNIQUE, mtime_ns INTEGER, size INTEGER)")
+    used_pages = "SELECT page_count - freelist_count FROM pragma_page_count, pragma_freelist_count"
+    pages_before = cursor.execute(used_pages).fetchone()[0]
 
-    cursor_application.execute("DROP TABLE IF EXISTS applications")
-    cursor_application.execute("CREATE VIRTUAL TABLE applications USING fts5(name, command)")
-    for app, command in application_list.items():
-        cursor_application.execute("INSERT INTO applications (name, command) VALUES (?, ?)", (app.lower(), command))
+    prefix = root_dir.rstrip(os.sep) + os.sep if root_dir else ""
+    dirs = directory_paths(cursor)
+    extensions = sorted(CONTENT_EXTENSIONS)
+    paths = []
+    for parent, name in cursor.execute(
+            f"SELECT parent, name FROM entries WHERE ext IN ({', '.join('?' * len(extensions))})", extensions):
+        path = os.path.join(dirs.get(parent, ""), name)
+        if path.startswith(prefix):
+            paths.append(path)
 
+    files = []
+    texts = []
+    indexed = read = 0
+    # pool.map submits everything at once and keeps finished texts until they are
+    # read, so each slice is drained before the next one is handed out
+    slice_size = CONTENT_CHUNK_SIZE * CONTENT_SLICE_CHUNKS * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for offset in range(0, len(paths), slice_size):
+            for result in pool.map(extract_text, paths[offset:offset + slice_size], chunksize=CONTENT_CHUNK_SIZE):
+                if result is None:
+                    continue
+                path, mtime_ns, size, text = result
+                indexed += 1
+                read += len(text)
+                files.append((indexed, path, mtime_ns, size))
+                texts.append((indexed, text))
+                if read >= CONTENT_BATCH_BYTES:
+                    cursor.executemany("INSERT INTO content_files_new VALUES (?, ?, ?, ?)", files)
+                    cursor.executemany("INSERT INTO content_new (rowid, text) VALUES (?, ?)", texts)
+                    conn.commit()
+                    files, texts, read = [], [], 0
+    cursor.executemany("INSERT INTO content_files_new VALUES (?, ?, ?, ?)", files)
+    cursor.executemany("INSERT INTO content_new (rowid, text) VALUES (?, ?)", texts)
+    conn.commit()
+    cursor.execute("BEGIN")
+    cursor.execute("DROP TABLE IF EXISTS content")
+    cursor.execute("DROP TABLE IF EXISTS content_files")
+    cursor.execute("ALTER TABLE content_new RENAME TO content")
+    cursor.execute("ALTER TABLE content_files_new RENAME TO content_files")
+    conn.commit()
+
+    page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+    size_mb = (cursor.execute(used_pages).fetchone()[0] - pages_before) * page_size / 2**20
+    print(f"Content index: {indexed} of {len(paths)} text files, {size_mb:.1f} MiB, "
+          f"built in {time.perf_counter() - start:.1f}s")
+
+def build_content(workers=DEFAULT_WORKERS, name=DEFAULT_SHARD):
+    """Rebuild only the content index, for every file in the named root's index, in place"""
+    conn = sqlite3.connect(shard_path(name), timeout=WRITE_TIMEOUT)
+    for pragma in DEFAULT_PRAGMAS + CACHE_PRAGMAS:
+        conn.execute(pragma)
+    build_content_index(conn, workers=workers)
+    conn.close()
+
+def open_shadow(db_path):
+    """A new, empty database next to db_path for a rebuild, set up for bulk loading"""
+    shadow = db_path + SHADOW_SUFFIX
+    for leftover in (shadow, shadow + "-journal", shadow + "-wal", shadow + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)  # From a rebuild that was interrupted
+    conn = sqlite3.connect(shadow)
+    for pragma in BULK_LOAD_PRAGMAS:
+        conn.execute(pragma)
+    return conn, shadow
+
+def publish(conn, shadow, db_path):
+    """
+    Make the completed shadow database the live one at db_path, atomically for
+    readers. Without a live database it is simply renamed into place.
+    Otherwise it is copied into the live file with SQLite's online backup, in
+    a single write transaction: renaming over a WAL database that readers have
+    open could pair the new file with the old one's -wal and -shm files.
+    Readers keep seeing the old index until the copy commits.
+    """
+    for pragma in DEFAULT_PRAGMAS:
+        conn.execute(pragma)
+    if not os.path.exists(db_path):
+        conn.close()
+        os.replace(shadow, db_path)
+        return
+    live = sqlite3.connect(db_path, timeout=WRITE_TIMEOUT)
+    live.execute("PRAGMA journal_mode = WAL")
+    conn.backup(live)
+    # The copy went through the WAL; move it into the database file and empty the WAL
+    live.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    live.close()
+    conn.close()
+    os.remove(shadow)
+
+def build_index(root_dir, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, trigram=False,
+                ignore=True, count_ignored=False, content=False, name=DEFAULT_SHARD):
+    """
+    (Re)build the index of root_dir for the root called name. The new index is
+    written to a shadow database and published when complete, so searches
+    keep using the previous one until then.
+    """
+    root_dir = os.path.abspath(root_dir)
+    db_path = shard_path(name)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    rules = IgnoreRules.load(root_dir, stats=IgnoreStats(count_ignored)) if ignore else None
+    size_before = None
+    if os.path.exists(db_path):
+        live = sqlite3.connect(f"{Path(db_path).as_uri()}?mode=ro", uri=True)
+        size_before = name_index_bytes(live.cursor())
+        live.close()
+    conn_files, shadow = open_shadow(db_path)
+    cursor = conn_files.cursor()
+    create_entries(cursor)
+
+    writer = BatchWriter(conn_files, batch_size)
+    writer.tree.add_root(root_dir)
+    for rows in walk_parallel(root_dir, workers, rules):
+        writer.write(rows)
+    total = writer.close()
+    for entry_type, table in NAME_TABLES.items():
+        cursor.execute(f"INSERT INTO {table} (rowid, name) SELECT id, name FROM entries WHERE type = ?", (entry_type,))
+    create_entries_index(cursor)
     conn_files.commit()
-    conn_files.close()
-    conn_application.commit()
-    conn_application.close()
-    print(f"Index built for: {root_dir}")
+    index_bytes = conn_files.execute("PRAGMA page_count").fetchone()[0] * conn_files.execute("PRAGMA page_size").fetchone()[0]
+    size_after = name_index_bytes(cursor)
+    if trigram:
+        build_trigram_index(conn_files)
+    if content:
+        build_content_index(conn_files, root_dir, workers)
+    publish(conn_files, shadow, db_path)
+    build_catalogue(APPLICATION_DB_PATH, application_list)
+    elapsed = time.perf_counter() - writer.start
+    print(f"Index '{name}' built for: {root_dir} ({total} entries in {elapsed:.1f}s, "
+          f"{total / max(elapsed, 1e-9):.0f} rows/s)")
+    if rules is not None and rules.stats.entries:
+        report_ignored(rules.stats, total, index_bytes)
+    if size_after is not None:
+        print(f"Name index size: {size_after / 2**20:.1f} MiB"
+              + (f" (previous index: {size_before / 2**20:.1f} MiB)" if size_before else ""))
 
-def search(term, kind=None):
-    conn = sqlite3.connect(DB_PATH)
+def name_index_bytes(cursor):
+    """
+    Bytes used by `entries` and the name indexes, leaving out the optional
+    trigram and content indexes, or None if SQLite lacks the dbstat table.
+    """
+    try:
+        return cursor.execute("""
+            SELECT coalesce(sum(pgsize), 0) FROM dbstat
+            WHERE name NOT LIKE 'entries_trigram%' AND name NOT LIKE 'content%'
+              AND name NOT LIKE 'sqlite_autoindex_content%' AND name != 'sqlite_schema'
+        """).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+def report_ignored(stats, total, index_bytes):
+    """Print what the ignore rules kept out, with the index size it would have taken"""
+    bytes_per_row = index_bytes / max(total, 1)
+    avoided = stats.entries if stats.count_pruned else stats.dirs + stats.files
+    estimate = "" if stats.count_pruned else "at least "
+    print(f"Ignored: {stats.dirs} directories and {stats.files} files pruned"
+          + (f" ({stats.below} entries inside the directories)" if stats.count_pruned else "")
+          + f", {estimate}{avoided} entries and ~{avoided * bytes_per_row / 2**20:.1f} MiB of index avoided")
+
+def rescan(root_dir, ignore=True, name=DEFAULT_SHARD):
+    """
+    Incrementally refresh the index of root_dir. Every indexed directory is
+    stat-ed, but only those whose mtime or inode changed are listed again;
+    their removed children are deleted (with their subtrees) and new children
+    are added, new directories with everything below them. Files changed since
+    the last --content run drop out of content results. Falls back to
+    build_index when root_dir is not the root indexed under name.
+    """
+    root_dir = os.path.abspath(root_dir)
+    db_path = shard_path(name)
+    conn = sqlite3.connect(db_path, timeout=WRITE_TIMEOUT) if os.path.exists(db_path) else None
+    try:
+        root = conn and schema_is_current(conn) and conn.execute(
+            "SELECT id FROM entries WHERE parent IS NULL AND name = ?", (root_dir,)).fetchone()
+    except sqlite3.OperationalError:
+        root = None
+    if not root:
+        if conn is not None:
+            conn.close()
+        print(f"{root_dir} is not indexed as '{name}' in the current index format, building the full index")
+        build_index(root_dir, ignore=ignore, name=name)
+        return
+
+    start = time.perf_counter()
+    for pragma in DEFAULT_PRAGMAS:
+        conn.execute(pragma)  # Indexes built before WAL was the default switch now
     cursor = conn.cursor()
+    writer = TreeWriter(cursor)
+    checked = relisted = added = removed = 0
+    stack = [(root[0], root_dir, IgnoreRules.load(root_dir) if ignore else None)]
+    while stack:
+        dir_id, path, rules = stack.pop()
+        checked += 1
+        try:
+            st = os.stat(path)
+        except OSError:
+            # Vanished since its parent was listed; the parent's mtime changed as well
+            continue
+        writer.dir_ids[path] = dir_id
+        if cursor.execute("SELECT 1 FROM entries WHERE id = ? AND mtime_ns = ? AND inode = ?",
+                          (dir_id, st.st_mtime_ns, st.st_ino)).fetchone():
+            child_rules = rules.for_dir(path) if rules is not None else None
+            stack.extend((child_id, os.path.join(path, name), child_rules) for child_id, name in cursor.execute(
+                "SELECT id, name FROM entries WHERE parent = ? AND inode IS NOT NULL", (dir_id,)).fetchall())
+            continue
 
-    query = f"{term}*"
-    if kind:
-        cursor.execute("SELECT path, type FROM entries WHERE name MATCH ? AND type = ?", (query, kind))
-    else:
-        cursor.execute("SELECT path, type FROM entries WHERE name MATCH ?", (query,))
+        relisted += 1
+        rows, subdirs, child_rules = list_dir(path, rules=rules)
+        subdirs = set(subdirs)
+        current = {row[1]: row for row in rows or []}
+        existing = {name: (child_id, child_type, inode) for child_id, name, child_type, inode in cursor.execute(
+            "SELECT id, name, type, inode FROM entries WHERE parent = ?", (dir_id,)).fetchall()}
+
+        for name, (child_id, child_type, inode) in existing.items():
+            row = current.get(name)
+            # A directory that became a symlink (or the reverse) is replaced as well
+            if row is None or row[2] != child_type or (row[6] is None) != (inode is None):
+                delete_entries(cursor, child_id, recursive=child_type == "directory",
+                               path=os.path.join(path, name))
+                removed += 1
+
+        for name, row in current.items():
+            known = existing.get(name)
+            if known and known[1] == row[2] and (row[6] is None) == (known[2] is None):
+                if row[6] is not None:
+                    # Already indexed: checked against its own mtime further down
+                    stack.append((known[0], row[0], child_rules))
+                continue
+            added += insert_entries(cursor, [row], writer)
+            if row[0] in subdirs:
+                for chunk in scan_tree(row[0], rules=child_rules):
+                    added += insert_entries(cursor, chunk, writer)
+
+        cursor.execute("UPDATE entries SET mtime_ns = ?, inode = ? WHERE id = ?", (st.st_mtime_ns, st.st_ino, dir_id))
 
-    results = cursor.fetchall()
+    stale = drop_stale_content(cursor) if has_content_index(cursor) else 0
+    conn.commit()
     conn.close()
+    print(f"Rescanned {root_dir}: {checked} directories checked, {relisted} re-listed, "
+          f"{added} entries added, {removed} removed, {stale} changed files dropped from content results "
+          f"in {time.perf_counter() - start:.2f}s")
+
+class IndexEventHandler(FileSystemEventHandler):
+    """
+    Collects watchdog events as a {path: recursive} map of dirty paths.
+    Events for the same path collapse into one entry, so a storm of events
+    (git checkout, unpacked tarball, ...) becomes a single batch.
+    """
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.first_event = None
+        self.last_event = None
+        self.wakeup = threading.Event()
+
+    def mark(self, path, recursive):
+        with self.lock:
+            self.pending[path] = self.pending.get(path, False) or recursive
+            now = time.monotonic()
+            if self.first_event is None:
+                self.first_event = now
+            self.last_event = now
+            self.wakeup.set()
+
+    def on_created(self, event):
+        self.mark(event.src_path, event.is_directory)
+
+    def on_deleted(self, event):
+        self.mark(event.src_path, event.is_directory)
+
+    def on_moved(self, event):
+        self.mark(event.src_path, event.is_directory)
+        self.mark(event.dest_path, event.is_directory)
+
+    def on_modified(self, event):
+        # Directory modifications only mean a child changed, and the child has its own event
+        if not event.is_directory:
+            self.mark(event.src_path, False)
+
+    def wait_for_batch(self, quiet_period=WATCH_QUIET_PERIOD, max_delay=WATCH_MAX_DELAY):
+        """
+        Block until events are pending and either no new event arrived for
+        quiet_period seconds or the oldest one has waited max_delay seconds.
+        Returns the pending {path: recursive} map and starts a new one.
+        """
+        while True:
+            self.wakeup.wait()
+            with self.lock:
+                if not self.pending:
+                    self.wakeup.clear()
+                    continue
+                now = time.monotonic()
+                wait = min(self.last_event + quiet_period, self.first_event + max_delay) - now
+                if wait <= 0:
+                    batch, self.pending = self.pending, {}
+                    self.first_event = self.last_event = None
+                    self.wakeup.clear()
+                    return batch
+            time.sleep(wait)
+
+def apply_changes(conn, root_dir, changes, rules=None):
+    """
+    Bring `entries` in line with the filesystem for a batch of dirty paths,
+    in a single transaction. Every path is deleted and re-inserted if it still
+    exists and is not ignored by rules (loaded for root_dir); recursive paths
+    (directories) are refreshed together with their subtree.
+    Returns the number of rows written.
+    """
+    # Paths below a directory that is refreshed recursively are already covered
+    covered = {path for path, recursive in changes.items() if recursive and path != root_dir}
+    paths = []
+    for path, recursive in changes.items():
+        parent = os.path.dirname(path)
+        while parent not in covered and parent != root_dir and parent != os.path.dirname(parent):
+            parent = os.path.dirname(parent)
+        if path != root_dir and parent not in covered:
+            paths.append((path, recursive))
+
+    written = 0
+    with conn:
+        cursor = conn.cursor()
+        writer = TreeWriter(cursor)
+        for path, recursive in paths:
+            found = path_id(cursor, path)
+            if found is not None:
+                # A directory always goes with its subtree, or its children would be orphaned
+                delete_entries(cursor, found[0], recursive=found[1] == "directory", path=path)
+            if not os.path.lexists(path):
+                continue
+            path_rules = rules.for_path(root_dir, path) if rules is not None else None
+            if rules is not None and path_rules is None:
+                continue
+            row = path_row(path)
+            if row is None:
+                continue
+            rows = [row]
+            if row[6] is not None:
+                for chunk in scan_tree(path, rules=path_rules):
+                    rows.extend(chunk)
+            # Rows whose directory is not indexed (ignored, or gone meanwhile) are dropped
+            written += insert_entries(cursor, rows, writer)
+    return written
+
+def watch(root_dir, ignore=True, name=DEFAULT_SHARD):
+    """Keep the index of the root called name up to date with the changes happening below root_dir"""
+    root_dir = os.path.abspath(root_dir)
+    rules = IgnoreRules.load(root_dir) if ignore else None
+    db_path = shard_path(name)
+    conn = sqlite3.connect(db_path, timeout=WRITE_TIMEOUT) if os.path.exists(db_path) else None
+    if conn is None or not schema_is_current(conn.cursor()):
+        if conn is not None:
+            conn.close()
+        print(f"Index of {root_dir} is missing or in an older format, building it first")
+        build_index(root_dir, ignore=ignore, name=name)
+        conn = sqlite3.connect(db_path, timeout=WRITE_TIMEOUT)
+    for pragma in DEFAULT_PRAGMAS:
+        conn.execute(pragma)
+    cursor = conn.cursor()
+    create_entries(cursor)
+    create_entries_index(cursor)
+    conn.commit()
+
+    handler = IndexEventHandler()
+    observer = Observer()
+    observer.schedule(handler, root_dir, recursive=True)
+    observer.start()
+    print(f"Watching {root_dir} for changes (Ctrl+C to stop)")
+
+    try:
+        while True:
+            changes = handler.wait_for_batch()
+            start = time.perf_counter()
+            written = apply_changes(conn, root_dir, changes, rules)
+            print(f"Applied {len(changes)} change(s), {written} row(s) written "
+                  f"in {time.perf_counter() - start:.3f}s")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
+        conn.close()
+
+def search(term, kind=None):
+    query = f"{term}*"
+    results = []
+    for db_path in list_shards().values():
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        rows = []
+        for entry_type, table in NAME_TABLES.items():
+            if kind in (None, entry_type):
+                cursor.execute(f"SELECT e.parent, e.name, e.type FROM {table} JOIN entries e ON e.id = {table}.rowid "
+                               f"WHERE {table} MATCH ?", (query,))
+                rows += cursor.fetchall()
+        dirs = directory_paths(cursor) if rows else {}
+        results += [(os.path.join(dirs.get(parent, ""), name), entry_type) for parent, name, entry_type in rows]
+        conn.close()
 
     print(f"\nSearch results for '{term}' ({kind if kind else 'all'}):")
     for path, entry_type in results:
         print(f"[{entry_type}] {path}")
 
+def show_shards():
+    """Print every named root with its indexed path, size and number of entries"""
+    shards = list_shards()
+    if not shards:
+        print("No index built yet")
+    for name, db_path in shards.items():
+        conn = sqlite3.connect(db_path)
+        try:
+            root = conn.execute("SELECT name FROM entries WHERE parent IS NULL").fetchone()
+            count = conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+        except sqlite3.OperationalError:
+            root, count = None, 0
+        conn.close()
+        print(f"{name:<16} {root[0] if root else '(older format)':<40} {count:>10} entries "
+              f"{os.path.getsize(db_path) / 2**20:>8.1f} MiB")
+
+def index_name(value):
+    """argparse type for --name"""
+    try:
+        shard_path(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Spotlight Clone Indexer")
     parser.add_argument("--index", type=str, help="Path to index")
+    parser.add_argument("--trigram", action="store_true",
+                        help="Also build a trigram name index for substring search")
+    parser.add_argument("--rescan", type=str, help="Path to re-index incrementally, re-listing only the directories that changed")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows inserted and committed per batch while indexing")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Crawler threads used while indexing")
+    parser.add_argument("--no-ignore", action="store_true",
+                        help="Index everything, including .git, node_modules and paths in .gitignore files")
+    parser.add_argument("--count-ignored", action="store_true",
+                        help="Also count the entries inside ignored directories (slower)")
+    parser.add_argument("--content", action="store_true",
+                        help="Also index the text of source, markdown, LaTeX and other text files "
+                             "(alone: rebuild the content index for the files already indexed)")
+    parser.add_argument("--apps", action="store_true",
+                        help="Refresh the application catalogue from .desktop files only")
+    parser.add_argument("--watch", type=str, help="Path to keep indexed as it changes")
+    parser.add_argument("--name", type=index_name, default=DEFAULT_SHARD,
+                        help="Name of the root for --index, --rescan, --watch and --content; "
+                             "every root has its own database and all of them are searched")
+    parser.add_argument("--list", action="store_true", help="List the indexed roots")
     parser.add_argument("--search", type=str, help="Search term")
     parser.add_argument("--type", type=str, choices=["file", "directory"], help="Type to search for")
 
     args = parser.parse_args()
 
     if args.index:
-        build_index(args.index)
+        build_index(args.index, args.batch_size, args.workers, args.trigram,
+                    not args.no_ignore, args.count_ignored, args.content, args.name)
+    elif args.content:
+        build_content(args.workers, args.name)
+    elif args.apps:
+        build_catalogue(APPLICATION_DB_PATH, application_list)
+    elif args.rescan:
+        rescan(args.rescan, not args.no_ignore, args.name)
+    elif args.watch:
+        watch(args.watch, not args.no_ignore, args.name)
+    elif args.list:
+        show_shards()
     elif args.search:
         search(args.search, args.type)
     else:
         print("Usage:")
-        print("  python indexer.py --index /path/to/folder")
+        print("  python indexer.py --index /path/to/folder [--name projects]")
+        print("  python indexer.py --rescan /path/to/folder")
+        print("  python indexer.py --content")
+        print("  python indexer.py --apps")
+        print("  python indexer.py --watch /path/to/folder")
+        print("  python indexer.py --list")
         print("  python indexer.py --search name [--type file|directory]")
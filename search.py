@@ -1,118 +1,964 @@
 import os
+import functools
+import heapq
 import subprocess
 from pathlib import Path
 import shlex
-import fnmatch
 import sqlite3
+import threading
+import re
+import unicodedata
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import tracing
+from tracing import traced
+from tree import ROOT_TYPE, entry_paths, path_id
+
+try:
+    import numpy as np
+except ImportError:  # Only needed by the optional fuzzy backend
+    np = None
 
 MAX_CHAR = 50 # Maximum characters for file name display
 BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = str(BASE_DIR / "spotlight_index.db")
-APPLICATION_DB_PATH = str(BASE_DIR / "applications.db")
+DATA_DIR = Path(os.environ.get("SPOTLIGHT_DATA_DIR") or BASE_DIR)  # Where the databases live
+DB_PATH = str(DATA_DIR / "spotlight_index.db")
+SHARD_DIR = str(DATA_DIR / "indexes") # Databases of the other named roots (indexer.py --name)
+APPLICATION_DB_PATH = str(DATA_DIR / "applications.db")
+HISTORY_DB_PATH = str(DATA_DIR / "history.db")
 HOME_DIR = str(Path.home())
+STATEMENT_CACHE_SIZE = 256 # Compiled statements kept per connection
+RESULT_LIMIT = 10 # Results returned per category
+CANDIDATE_LIMIT = 200 # Rows fetched per query, so longer terms can be narrowed in memory
+QUERY_CACHE_SIZE = 128 # Candidate sets kept in the query cache
+SHARD_WORKERS = 8 # Shards searched at the same time
+SHARD_TIMEOUT = 2.0 # Seconds a search waits for a shard before leaving it out
+SNIPPET_CONTEXT = 40 # Characters shown on each side of a content match
+SNIPPET_MAX_BYTES = 2**20 # Same head of the file the content index covers
+TRIGRAM_MIN_LENGTH = 3 # Shortest term the trigram (substring) index can match
+FRECENCY_HALF_LIFE = 14 * 24 * 3600 # Seconds after which a launch counts half
+FRECENCY_WEIGHT = 2.0 # Rank points (bm25) worth one recent launch
+NAME_TABLES = {"file": "file_names", "directory": "dir_names"} # Name index of each entry type
+# Backend for file and directory names: "fts" (SQLite FTS5) or "fuzzy" (in-memory, needs NumPy)
+SEARCH_BACKEND = os.environ.get("SPOTLIGHT_SEARCH_BACKEND", "fts")
+FUZZY_RELOAD_INTERVAL = 30 # Minimum seconds between reloads of the fuzzy store after index writes
+
+# fzf-style fuzzy scoring
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = 8 # Match right after a separator or at the start of the name
+BONUS_CAMEL = 7 # Match on a camelCase hump or where digits start
+BONUS_CONSECUTIVE = 4
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+SEPARATORS = b"/_-. "
+
+_local = threading.local()
+# Held while the history database is created, so no connection attaches it before it has its table
+_history_lock = threading.RLock()
+
+def open_history():
+    """Open the launch history database for writing, creating it if needed"""
+    with _history_lock:
+        conn = sqlite3.connect(HISTORY_DB_PATH)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS launches (
+                key TEXT PRIMARY KEY,
+                kind TEXT,
+                launches INTEGER,
+                score REAL,
+                last_used REAL
+            )
+        """)
+    return conn
+
+def record_launch(kind, key):
+    """
+    Record that a file, directory or application command was launched.
+    The stored score is the frecency at last_used: the previous score decayed
+    hyperbolically (halved after FRECENCY_HALF_LIFE) plus one for this launch.
+    """
+    try:
+        with open_history() as conn:
+            conn.execute("""
+                INSERT INTO launches (key, kind, launches, score, last_used) VALUES (?, ?, 1, 1.0, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    launches = launches + 1,
+                    score = score / (1 + (excluded.last_used - last_used) / ?) + 1,
+                    last_used = excluded.last_used
+            """, (key, kind, time.time(), FRECENCY_HALF_LIFE))
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Database error (history): {e}")
+
+# SQL for the current frecency of a launches row `h`; the parameter is the current time
+FRECENCY_SQL = f"coalesce(h.score / (1 + (? - h.last_used) / {FRECENCY_HALF_LIFE}), 0)"
+
+def frecency(db_path, entry_id, now):
+    """
+    SQL function frecency(id, now) of the connection to db_path: the current
+    frecency of an entry, from the launches loaded by load_launches. Entries
+    have no path column to join the history on, so launched paths are
+    resolved to ids first.
+    """
+    launch = _local.launches[db_path][1].get(entry_id)
+    return launch[0] / (1 + (now - launch[1]) / FRECENCY_HALF_LIFE) if launch else 0.0
+
+def load_launches(conn, db_path, generation):
+    """
+    Resolve the launched files and directories to entry ids of db_path, once
+    per ranking generation. Returns whether any of them is in this index.
+    """
+    loaded = _local.__dict__.setdefault("launches", {})
+    if db_path not in loaded or loaded[db_path][0] != generation:
+        launches = {}
+        rows = conn.execute("SELECT key, score, last_used FROM history.launches WHERE kind IN ('file', 'directory')")
+        for path, score, last_used in rows.fetchall():
+            found = path_id(conn, path)
+            if found is not None:
+                launches[found[0]] = (score, last_used)
+        loaded[db_path] = (generation, launches)
+    return bool(loaded[db_path][1])
+
+def get_connection(db_path):
+    """
+    Return the calling thread's read-only connection to db_path, with the
+    launch history attached as `history`.
+    Connections are opened once per thread and kept for later queries, so the
+    schema is parsed and statements compiled only once; a connection is reopened
+    when the file is replaced (new inode), e.g. when a first build is renamed
+    into place. Rebuilds of an existing index are published inside the same
+    file and simply show up in the next read transaction.
+    """
+    connections = _local.__dict__.setdefault("connections", {})
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        raise sqlite3.OperationalError(f"index not found: {db_path}")
+    identity = (st.st_dev, st.st_ino)
+
+    cached = connections.get(db_path)
+    if cached and cached[1] == identity:
+        return cached[0]
+    if cached:
+        cached[0].close()
+    conn = sqlite3.connect(f"{Path(db_path).as_uri()}?mode=ro", uri=True,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    with _history_lock:
+        if not os.path.exists(HISTORY_DB_PATH):
+            open_history().close()
+    conn.execute("ATTACH DATABASE ? AS history", (f"{Path(HISTORY_DB_PATH).as_uri()}?mode=ro",))
+    conn.create_function("frecency", 2, functools.partial(frecency, db_path))
+    connections[db_path] = (conn, identity)
+    return conn
+
+def shard_paths():
+    """Database files of every indexed root: DB_PATH, then the named roots"""
+    paths = [DB_PATH] if os.path.exists(DB_PATH) else []
+    try:
+        paths += sorted(os.path.join(SHARD_DIR, name) for name in os.listdir(SHARD_DIR) if name.endswith(".db"))
+    except OSError:
+        pass
+    return paths
+
+shard_pool = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard")
+
+def query_shards(function, *args):
+    """
+    Call function(db_path, *args) for every shard and return the results of
+    those that answered. Several shards are queried concurrently, so a search
+    takes as long as the slowest one; a shard that fails (e.g. while it is
+    rebuilt) or takes longer than SHARD_TIMEOUT is left out instead of
+    holding up the others.
+    """
+    paths = shard_paths()
+    if len(paths) == 1:
+        try:
+            return [function(paths[0], *args)]
+        except sqlite3.Error as e:
+            print(f"Database error ({paths[0]}): {e}")
+            return []
+    futures = [shard_pool.submit(function, path, *args) for path in paths]
+    done, _ = wait(futures, timeout=SHARD_TIMEOUT)
+    results = []
+    for path, future in zip(paths, futures):
+        if future not in done:
+            print(f"Index {path} did not answer within {SHARD_TIMEOUT}s, left out")
+        elif isinstance(future.exception(), sqlite3.Error):
+            print(f"Database error ({path}): {future.exception()}")
+        else:
+            results.append(future.result())
+    return results
+
+def merge_shards(results, limit, key):
+    """The best limit rows of several shards' result lists by key, without duplicate paths"""
+    if len(results) == 1:
+        return results[0][:limit]
+    merged = []
+    seen = set()
+    for row in sorted((row for rows in results for row in rows), key=key):
+        if row[0] not in seen:
+            seen.add(row[0])
+            merged.append(row)
+            if len(merged) == limit:
+                break
+    return merged
+
+def index_generation(db_path):
+    """
+    Identify the current contents of a database file; it changes on every write or rebuild.
+    In WAL mode commits land in the -wal file and reach the database file only
+    at checkpoints, so the -wal file is part of the generation.
+    """
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return None
+    try:
+        wal = os.stat(db_path + "-wal")
+        wal = (wal.st_mtime_ns, wal.st_size)
+    except OSError:
+        wal = None
+    return st.st_ino, st.st_mtime_ns, st.st_size, wal
+
+def ranking_generation(db_path):
+    """Generation of ranked results from db_path: they also change with the launch history"""
+    return index_generation(db_path), index_generation(HISTORY_DB_PATH)
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def tokenize(text):
+    """Split text into tokens the way the FTS5 unicode61 tokenizer does"""
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text)
+
+def matches_prefix_phrase(term_tokens, columns):
+    """In-memory equivalent of the FTS5 query '"term"*' against a row's columns"""
+    if not term_tokens:
+        return False
+    *head, last = term_tokens
+    for column in columns:
+        tokens = tokenize(column)
+        for i in range(len(tokens) - len(head)):
+            if tokens[i:i + len(head)] == head and tokens[i + len(head)].startswith(last):
+                return True
+    return False
+
+def make_snippet(path, term):
+    """
+    The text around the first match of term in path, one line long. The content
+    index does not store the text, so it is read again from the file.
+    """
+    tokens = tokenize(term)
+    try:
+        with open(path, "rb") as f:
+            text = f.read(SNIPPET_MAX_BYTES).decode("utf-8", errors="replace")
+    except OSError:
+        return ""
+    pattern = r"(?<![^\W_])" + r"[\W_]+".join(re.escape(token) for token in tokens) if tokens else re.escape(term)
+    match = re.search(pattern, text, re.IGNORECASE)
+    start = max(match.start() - SNIPPET_CONTEXT, 0) if match else 0
+    end = match.end() + SNIPPET_CONTEXT if match else 2 * SNIPPET_CONTEXT
+    snippet = " ".join(text[start:end].split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+
+def entry_name(row):
+    """Indexed text of an (id, type, name) candidate row: only the name is in the FTS index"""
+    return (row[2],)
+
+def has_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+def substring_searchable(conn, term):
+    """Whether names containing term anywhere can be found: it is long enough and there is a trigram index"""
+    return len(term) >= TRIGRAM_MIN_LENGTH and has_table(conn, "entries_trigram")
+
+def rank_key(term, name, rank, source):
+    """
+    Sort key of a name hit: exact name matches first, then names starting
+    with term, then other token-prefix hits (source 0), then substring-only
+    hits (source 1); within a group, by (frecency-blended) rank.
+    """
+    needle = term.lower()
+    lowered = name.lower()
+    if lowered == needle:
+        return (0, source, rank)
+    if lowered.startswith(needle):
+        return (1, source, rank)
+    return (2 + source, source, rank)
+
+def rerank(term, rows):
+    """
+    Rank (id, type, name, rank, source) rows narrowed from a shorter term's
+    candidates for term, as rank_together would: names matching term as a
+    token prefix count as token-prefix hits, whichever index found them.
+    """
+    term_tokens = tokenize(term)
+    rows = [(entry_id, entry_type, name, rank, 0 if matches_prefix_phrase(term_tokens, (name,)) else source)
+            for entry_id, entry_type, name, rank, source in rows]
+    rows.sort(key=lambda row: rank_key(term, row[2], row[3], row[4]))
+    return rows
+
+def rank_together(term, token_rows, substring_rows):
+    """
+    Merge (id, type, name, rank) rows from the token-prefix index and the
+    trigram index into one ranking by rank_key.
+    Returns (id, type, name, rank, source) rows.
+    """
+    seen = set()
+    ranked = []
+    for source, rows in ((0, token_rows), (1, substring_rows)):
+        for entry_id, entry_type, name, rank in rows:
+            if entry_id not in seen:
+                seen.add(entry_id)
+                ranked.append((entry_id, entry_type, name, rank, source))
+    ranked.sort(key=lambda row: rank_key(term, row[2], row[3], row[4]))
+    return ranked
+
+class QueryCache:
+    """
+    Bounded LRU of query candidates keyed by (kind, term), tagged with the
+    index generation they were read from. A term that extends a cached term
+    is answered by filtering the cached candidates in memory, as long as
+    they were complete or still leave enough rows after filtering.
+    In substring mode rows also match when the term occurs in their name,
+    so only prefixes long enough for the trigram index can be narrowed.
+    """
+    def __init__(self, maxsize=QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, kind, term, generation, limit, substring=False, columns=None, rank=None):
+        """
+        Return (candidate rows, complete) for term, or None if the database must be
+        queried; there are at least limit rows unless complete says they are all.
+        columns(row) gives the indexed text of a row; by default the whole row.
+        rank(term, rows) puts narrowed rows in the order a fresh query for term
+        would return them; by default they keep the order of the shorter term.
+        """
+        shortest = TRIGRAM_MIN_LENGTH if substring else 1
+        with self.lock:
+            for end in range(len(term), shortest - 1, -1):
+                cached = self.entries.get((kind, term[:end]))
+                # A prefix without tokens matches nothing, so it cannot be narrowed
+                if cached and cached[0] == generation and (end == len(term) or tokenize(term[:end])):
+                    self.entries.move_to_end((kind, term[:end]))
+                    break
+            else:
+                return None
+        _, rows, complete = cached
+        if end == len(term):
+            return rows, complete
+
+        term_tokens = tokenize(term)
+        needle = term.lower()
+        narrowed = [row for row in rows if matches_prefix_phrase(term_tokens, columns(row) if columns else row)
+                    or (substring and needle in (columns(row) if columns else row)[0].lower())]
+        if not complete and len(narrowed) < limit:
+            return None  # The cached candidates ran out, only the database has the rest
+        if rank:
+            narrowed = rank(term, narrowed)
+        self.put(kind, term, generation, narrowed, complete)
+        return narrowed, complete
+
+    def put(self, kind, term, generation, rows, complete):
+        with self.lock:
+            self.entries[(kind, term)] = (generation, rows, complete)
+            self.entries.move_to_end((kind, term))
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+query_cache = QueryCache()
+
+class NameCursor:
+    """
+    Where a paginated name search (SearchInFiles.search_page) stopped, for
+    every shard it started with. Shards continue with keyset queries, past the
+    last (score, id) they read, never with an OFFSET: a later page costs as
+    much as the first instead of rereading everything before it.
+    """
+    def __init__(self, term, kind, fuzzy=False):
+        self.term = term
+        self.kind = kind
+        self.now = time.time()  # Frecency is taken at one instant, so scores (and keysets) stay put
+        shard = FuzzyShard if fuzzy else FtsShard
+        self.shards = {db_path: shard() for db_path in shard_paths()}
+        self.seen = set()  # Paths already returned, e.g. by another shard or an earlier window
+
+    @property
+    def exhausted(self):
+        return all(shard.exhausted for shard in self.shards.values())
+
+class FtsShard:
+    """
+    Paging state of one shard in the FTS backend. Candidates are read in
+    windows of up to CANDIDATE_LIMIT rows per name index, ranked by rank_key
+    within the window; rows read but not returned yet wait in pending.
+    """
+    def __init__(self):
+        self.pending = []
+        self.after = None  # {source: (score, id) keyset, None for the top}; sources that ran out are left out
+        self.ids = set()  # Ids read so far, skipped when a later window reads them again
+
+    @property
+    def exhausted(self):
+        return self.after == {} and not self.pending
+
+    def peek(self, db_path, cursor, need):
+        """The next need (path, type, rank key) results, without consuming them"""
+        conn = get_connection(db_path)
+        if self.after is None:
+            rows, self.after = SearchInFiles.first_window(conn, db_path, cursor.term, cursor.kind, cursor.now, need)
+            self.pending = list(rows)  # A copy: rows may be the query cache's own list
+            self.ids.update(row[0] for row in self.pending)
+        while len(self.pending) < need and self.after:
+            rows, self.after = SearchInFiles.name_window(conn, db_path, cursor.term, cursor.kind,
+                                                         cursor.now, self.after)
+            rows = [row for row in rows if row[0] not in self.ids]
+            self.ids.update(row[0] for row in rows)
+            self.pending += rows
+        head = self.pending[:need]
+        paths = entry_paths(conn, [row[0] for row in head])
+        # Deleted since they were read: drop them, so the results line up with pending
+        head = [row for row in head if row[0] in paths]
+        # In rank key order, which is also how shards are merged
+        head.sort(key=lambda row: rank_key(cursor.term, row[2], row[3], row[4]))
+        self.pending[:need] = head
+        return [(paths[entry_id], entry_type, rank_key(cursor.term, name, rank, source))
+                for entry_id, entry_type, name, rank, source in head]
+
+    def consume(self, count):
+        del self.pending[:count]
+
+class FuzzyShard:
+    """Paging state of one shard in the fuzzy backend: the (score, id) of the last result returned"""
+    def __init__(self):
+        self.after = None
+        self.keys = []
+        self.last = False  # The store had no more results than the last peek returned
+
+    @property
+    def exhausted(self):
+        return self.last and not self.keys
+
+    def peek(self, db_path, cursor, need):
+        rows = fuzzy_store(db_path).search(cursor.term, cursor.kind, need, self.after) or []
+        self.keys = [(score, entry_id) for _, _, score, entry_id in rows]
+        self.last = len(rows) < need
+        # Best score first, then by id, like the store orders them
+        return [(path, entry_type, (-score, entry_id)) for path, entry_type, score, entry_id in rows]
+
+    def consume(self, count):
+        if count:
+            self.after = self.keys[count - 1]
+        self.keys = self.keys[count:]
+
+class FuzzyNameStore:
+    """
+    In-memory fuzzy matcher over the names of `entries`.
+    Names live in one contiguous byte buffer, addressed by an offsets array,
+    instead of millions of str objects; paths are rebuilt from the parent ids
+    for the returned rows only. Per-name character masks and per-byte bonuses
+    are precomputed. Queries are scored in batches
+    with NumPy: candidates are prefiltered by character mask, then the query
+    is matched as a subsequence (greedily, leftmost) with fzf-like bonuses for
+    word boundaries, path separators and camelCase humps. Matching is
+    case-insensitive for ASCII.
+    The store loads in a background thread and reloads after index writes;
+    search() returns None until it is ready so callers can fall back to FTS.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.data = None
+        self.generation = None
+        self.loading = False
+        self.loaded_at = 0
+        self.last_query_seconds = 0.0
+
+    def ready(self):
+        """Whether search() can answer now; starts loading the store otherwise"""
+        if np is None:
+            return False
+        self.refresh()
+        return self.data is not None
+
+    def search(self, term, kind=None, limit=RESULT_LIMIT, after=None):
+        """
+        Return the best (path, type, score, id) rows for term, or None while the
+        store is not loaded. Rows are ordered by score, then id; after, the
+        (score, id) of the last row of the previous page, continues past it.
+        """
+        if not self.ready():
+            return None
+        data = self.data
+
+        start = time.perf_counter()
+        rows = self.score(data, term.lower().encode("utf-8", "surrogateescape"), kind, limit, after)
+        end = time.perf_counter()
+        self.last_query_seconds = end - start
+        tracing.record("search.fuzzy_score", start, end, names=len(data["kinds"]))
+        return rows
+
+    def refresh(self):
+        # Start a background (re)load when the index changed since the last one
+        generation = index_generation(self.db_path)
+        with self.lock:
+            if self.loading or generation is None or generation == self.generation:
+                return
+            if self.data is not None and time.monotonic() - self.loaded_at < FUZZY_RELOAD_INTERVAL:
+                return
+            self.loading = True
+        threading.Thread(target=self.load, args=(generation,), daemon=True).start()
+
+    def load(self, generation):
+        start = time.perf_counter()
+        try:
+            # A private connection: get_connection is per thread and this thread is short-lived
+            conn = sqlite3.connect(f"{Path(self.db_path).as_uri()}?mode=ro", uri=True)
+            names, name_ends = bytearray(), array("q", [0])
+            ids, parents = array("q"), array("q")
+            kinds = bytearray()
+            # The root rows are kept to rebuild paths, but never matched
+            kind_codes = {"file": 0, "directory": 1, ROOT_TYPE: 2}
+            cursor = conn.execute("SELECT id, parent, name, type FROM entries ORDER BY id")
+            while chunk := cursor.fetchmany(10000):
+                for entry_id, parent, name, entry_type in chunk:
+                    names += name.encode("utf-8", "surrogateescape")
+                    name_ends.append(len(names))
+                    ids.append(entry_id)
+                    parents.append(-1 if parent is None else parent)
+                    kinds.append(kind_codes[entry_type])
+            conn.close()
+            data = self.prepare(names, name_ends, ids, parents, kinds)
+        except Exception as e:
+            print(f"Error loading fuzzy name store: {e}")
+            data = None
+        with self.lock:
+            if data is not None:
+                self.data = data
+                self.generation = generation
+                self.loaded_at = time.monotonic()
+            self.loading = False
+        if data is not None:
+            print(f"Fuzzy name store: {len(data['kinds'])} names, "
+                  f"{self.footprint() / 2**20:.1f} MiB, loaded in {time.perf_counter() - start:.2f}s")
+
+    @staticmethod
+    def prepare(names, name_ends, ids, parents, kinds):
+        raw = np.frombuffer(bytes(names), dtype=np.uint8)
+        offsets = np.frombuffer(name_ends, dtype=np.int64)
+        starts, ends = offsets[:-1], offsets[1:]
+
+        lower = raw.copy()
+        upper = (raw >= ord("A")) & (raw <= ord("Z"))
+        lower[upper] += 32
 
-application_list = {
-    'firefox':'firefox', 
-    'visual studio code':'code',  
-    'whatsapp': 'whatsapp-linux-app', 
-    'spotify': 'spotify', 
-    'zoom':'zoom', 
-    'gaia-web':'firefox -new-window https://gaiaassistant.netlify.app/',
-    'overleaf':'firefox -new-window https://www.overleaf.com/project',
-    'moodle': 'firefox -new-window https://webapps.unitn.it/gestionecorsi/',
-    'postman':'postman',
-    'gmail': 'firefox -new-window https://mail.google.com/mail/u/0/#inbox',
-    'intellij': 'intellij-idea-ultimate',
-}
+        # Bonus of a match at each byte, from the byte before it
+        prev = np.empty_like(raw)
+        prev[1:] = raw[:-1]
+        is_lower = (raw >= ord("a")) & (raw <= ord("z"))
+        is_digit = (raw >= ord("0")) & (raw <= ord("9"))
+        prev_lower = np.zeros_like(is_lower)
+        prev_lower[1:] = is_lower[:-1]
+        prev_digit = np.zeros_like(is_digit)
+        prev_digit[1:] = is_digit[:-1]
+        bonus = np.zeros(len(raw), dtype=np.int16)
+        bonus[(prev_lower & upper) | (is_digit & ~prev_digit)] = BONUS_CAMEL
+        bonus[np.isin(prev, np.frombuffer(SEPARATORS, dtype=np.uint8))] = BONUS_BOUNDARY
+        bonus[starts[starts < len(raw)]] = BONUS_BOUNDARY
+
+        # One bit per character class present in each name, for prefiltering
+        masks = np.zeros(len(starts), dtype=np.uint64)
+        nonempty = ends > starts
+        if len(raw):
+            bits = np.left_shift(np.uint64(1), FuzzyNameStore.char_bits(lower))
+            masks[nonempty] = np.bitwise_or.reduceat(bits, starts[nonempty])
+
+        return {
+            "lower": lower,
+            "bonus": bonus,
+            "starts": starts,
+            "lengths": (ends - starts).astype(np.int32),
+            "masks": masks,
+            "names": raw,
+            "ids": np.frombuffer(ids, dtype=np.int64),
+            "parents": np.frombuffer(parents, dtype=np.int64),
+            "kinds": np.frombuffer(bytes(kinds), dtype=np.uint8),
+        }
+
+    @staticmethod
+    def char_bits(lowered):
+        # a-z -> 0-25, 0-9 -> 26-35, every other byte -> 36-63
+        lowered = lowered.astype(np.uint64)
+        bits = np.uint64(36) + lowered % np.uint64(28)
+        letters = (lowered >= ord("a")) & (lowered <= ord("z"))
+        digits = (lowered >= ord("0")) & (lowered <= ord("9"))
+        bits[letters] = lowered[letters] - np.uint64(ord("a"))
+        bits[digits] = lowered[digits] - np.uint64(ord("0")) + np.uint64(26)
+        return bits
+
+    def score(self, data, query, kind, limit, after=None):
+        query = np.frombuffer(query, dtype=np.uint8)
+        if not len(query):
+            return []
+        query_mask = np.bitwise_or.reduce(np.left_shift(np.uint64(1), self.char_bits(query)))
+
+        keep = ((data["masks"] & query_mask) == query_mask) & (data["lengths"] >= len(query))
+        keep &= data["kinds"] == (kind == "directory") if kind else data["kinds"] < 2
+        candidates = np.flatnonzero(keep)
+        if not len(candidates):
+            return []
+
+        # Gather the candidate names into one compact buffer
+        lengths = data["lengths"][candidates].astype(np.int64)
+        sub_ends = np.cumsum(lengths)
+        sub_starts = sub_ends - lengths
+        index = np.arange(sub_ends[-1]) + np.repeat(data["starts"][candidates] - sub_starts, lengths)
+        lower = data["lower"][index]
+        bonus = data["bonus"][index]
+
+        # Greedy leftmost subsequence match of the query, all candidates at once
+        position = sub_starts.copy()
+        previous = np.full(len(candidates), -1, dtype=np.int64)
+        scores = np.zeros(len(candidates), dtype=np.int32)
+        alive = np.arange(len(candidates))
+        for i, char in enumerate(query):
+            occurrences = np.flatnonzero(lower == char)
+            found = np.searchsorted(occurrences, position)
+            ok = found < len(occurrences)
+            match = occurrences[np.minimum(found, len(occurrences) - 1)]
+            ok &= match < sub_ends[alive]
+            alive, match, position, previous, scores = alive[ok], match[ok], position[ok], previous[ok], scores[ok]
+            if not len(alive):
+                return []
+
+            match_bonus = bonus[match].astype(np.int32)
+            if i == 0:
+                match_bonus *= BONUS_FIRST_CHAR_MULTIPLIER
+            else:
+                gap = match - previous - 1
+                scores += np.where(gap > 0, SCORE_GAP_START + SCORE_GAP_EXTENSION * (gap - 1), BONUS_CONSECUTIVE)
+            scores += SCORE_MATCH + match_bonus
+            previous = match
+            position = match + 1
+
+        # Shorter names win ties, then lower ids, so (score, id) orders the results completely
+        final = scores.astype(np.float64) - lengths[alive] / 1000
+        entries = candidates[alive]
+        ids = data["ids"][entries]
+        if after is not None:
+            later = (final < after[0]) | ((final == after[0]) & (ids > after[1]))
+            entries, final, ids = entries[later], final[later], ids[later]
+            if not len(entries):
+                return []
+        count = min(limit, len(final))
+        threshold = np.partition(final, len(final) - count)[len(final) - count]
+        top = np.flatnonzero(final >= threshold)
+        top = top[np.lexsort((ids[top], -final[top]))][:count]
+
+        return [(self.path(data, entry), "directory" if data["kinds"][entry] else "file", float(score), int(entry_id))
+                for entry, score, entry_id in zip(entries[top], final[top], ids[top])]
+
+    @staticmethod
+    def path(data, entry):
+        """Rebuild the path of the entry at position entry by walking up its parents"""
+        parts = []
+        while True:
+            start, length = data["starts"][entry], data["lengths"][entry]
+            parts.append(data["names"][start:start + length].tobytes().decode("utf-8", "surrogateescape"))
+            parent = data["parents"][entry]
+            # Rows are sorted by id, so a parent's position is found by bisection
+            entry = np.searchsorted(data["ids"], parent)
+            if parent < 0 or entry >= len(data["ids"]) or data["ids"][entry] != parent:
+                break
+        return os.path.join(*reversed(parts))
+
+    def footprint(self):
+        """Bytes held by the store's arrays"""
+        data = self.data
+        return sum(value.nbytes for value in data.values()) if data else 0
+
+    def stats(self):
+        """Size of the store and the time its last query took, for benchmark.py"""
+        return {
+            "names": int((self.data["kinds"] < 2).sum()) if self.data else 0,
+            "bytes": self.footprint(),
+            "last_query_ms": self.last_query_seconds * 1000,
+        }
+
+fuzzy_stores = {}
+fuzzy_stores_lock = threading.Lock()
+
+def fuzzy_store(db_path):
+    """The fuzzy name store of one shard, created on first use"""
+    with fuzzy_stores_lock:
+        if db_path not in fuzzy_stores:
+            fuzzy_stores[db_path] = FuzzyNameStore(db_path)
+        return fuzzy_stores[db_path]
 
 class SearchInFiles():
     def __init__(self):
         pass
 
     @staticmethod
-    def search(term, kind=None):
+    def search(term, kind=None, limit=RESULT_LIMIT):
         """
         Search for entries in the SQLite database using FTS5
+        Every indexed root (shard) is searched concurrently and the best
+        results of each are merged by rank_key.
+        When an index has a trigram name index and the term is long enough,
+        names containing the term anywhere are found too, ranked together
+        with the token-prefix matches.
         Args:
             term: Search term
             kind: Type of item to search for ("file" or "directory")
+            limit: Maximum number of results
         Returns:
             List of (path, type) tuples matching the search
         """
+        return SearchInFiles.search_page(term, kind, limit=limit)[0]
+
+    @staticmethod
+    @traced("search.search")
+    def search_page(term, kind=None, cursor=None, limit=RESULT_LIMIT):
+        """
+        One page of search results. Pass the returned cursor back for the next
+        page; it is None when there are no more. Every shard peeks at its next
+        results, the best limit of them are returned and only those are
+        consumed, so the others come first on the next page. A shard that
+        fails or times out is left out of the later pages too.
+        Returns:
+            ([(path, type)], cursor)
+        """
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-
-            # Escape special characters and add wildcard
-            escaped_term = term.replace('"', '""')
-            query = f'"{escaped_term}"*'
-
-            if kind:
-                cursor.execute("""
-                    SELECT path, type 
-                    FROM entries 
-                    WHERE entries MATCH ? AND type = ?
-                    ORDER BY rank
-                    LIMIT 10
-                """, (query, kind))
-            else:
-                cursor.execute("""
-                    SELECT path, type 
-                    FROM entries 
-                    WHERE entries MATCH ?
-                    ORDER BY rank
-                    LIMIT 10
-                """, (query,))
-
-            results = cursor.fetchall()
-            conn.close()
-            return results
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return []
+            cursor = cursor or NameCursor(term, kind)
+            results = []
+            while len(results) < limit:
+                peeked = dict(query_shards(SearchInFiles.search_shard, cursor, limit - len(results)))
+                for db_path in set(cursor.shards) - set(peeked):
+                    # It failed or timed out, and may still be peeking: never ask it again
+                    del cursor.shards[db_path]
+                taken = dict.fromkeys(peeked, 0)
+                merged = heapq.merge(*([(db_path, row) for row in rows] for db_path, rows in peeked.items()),
+                                     key=lambda item: item[1][2])
+                for db_path, (path, entry_type, _) in merged:
+                    if len(results) == limit:
+                        break
+                    taken[db_path] += 1
+                    if path not in cursor.seen:
+                        cursor.seen.add(path)
+                        results.append((path, entry_type))
+                for db_path, count in taken.items():
+                    if count:
+                        cursor.shards[db_path].consume(count)
+                if not any(taken.values()):
+                    break
+            return results, None if len(results) < limit or cursor.exhausted else cursor
         except Exception as e:
             print(f"Error performing search: {e}")
-            return []
+            return [], None
+
+    @staticmethod
+    @traced("search.search_shard")
+    def search_shard(db_path, cursor, need):
+        """The next need (path, type, rank key) results of the shard db_path, as (db_path, rows)"""
+        shard = cursor.shards.get(db_path)
+        return db_path, shard.peek(db_path, cursor, need) if shard else []
+
+    @staticmethod
+    def first_window(conn, db_path, term, kind, now, limit):
+        """
+        The first window of candidates of a shard, like name_window, from the
+        query cache when it can answer. Cached candidates may have been narrowed
+        from a shorter term's, so they carry no keysets: when they are not
+        complete, the next window starts again from the top.
+        """
+        generation = ranking_generation(db_path)
+        substring = substring_searchable(conn, term)
+        sources = (0, 1) if substring else (0,)
+        cached = query_cache.get((db_path, kind), term, generation, limit, substring, entry_name,
+                                 rerank if substring else None)
+        if cached is not None:
+            rows, complete = cached
+            return rows, {} if complete else dict.fromkeys(sources)
+        rows, after = SearchInFiles.name_window(conn, db_path, term, kind, now, dict.fromkeys(sources))
+        query_cache.put((db_path, kind), term, generation, rows, not after)
+        return rows, after
+
+    @staticmethod
+    def name_window(conn, db_path, term, kind, now, after):
+        """
+        One window of name candidates of a shard: the next CANDIDATE_LIMIT rows
+        of each source in after (0 the token-prefix name indexes, 1 the trigram
+        index) in (score, id) order, past the source's keyset or from the top
+        when it is None.
+        Returns ((id, type, name, rank, source) rows, the keysets of the next
+        window); sources that ran out are left out of them.
+        """
+        cursor = conn.cursor()
+
+        # Escape special characters and add wildcard
+        escaped_term = term.replace('"', '""')
+        query = f'"{escaped_term}"*'
+
+        # Rank blends the FTS rank (lower is better) with the launch frecency.
+        # Each type has its own name index, so a typed search reads no rows of the other type,
+        # and only the kept candidates are looked up in entries
+        launched = load_launches(conn, db_path, ranking_generation(db_path))
+        frecency_sql = " - ? * frecency(n.rowid, ?)" if launched else ""
+        frecency_params = (FRECENCY_WEIGHT, now) if launched else ()
+        next_after = {}
+        token_rows = substring_rows = []
+
+        if 0 in after:
+            keyset_sql, keyset = (" WHERE (score, id) > (?, ?)", after[0]) if after[0] else ("", ())
+            tables = [(entry_type, table) for entry_type, table in NAME_TABLES.items() if kind in (None, entry_type)]
+            selects = [f"""
+                SELECT n.rowid AS id, '{entry_type}' AS type, n.rank{frecency_sql} AS score
+                FROM {table} n
+                WHERE n.{table} MATCH ?
+            """ for entry_type, table in tables]
+            cursor.execute(f"""
+                SELECT c.id, c.type, e.name, c.score
+                FROM (SELECT * FROM ({" UNION ALL ".join(selects)}){keyset_sql} ORDER BY score, id LIMIT ?) c
+                JOIN entries e ON e.id = c.id
+                ORDER BY c.score, c.id
+            """, (*frecency_params, query) * len(tables) + tuple(keyset) + (CANDIDATE_LIMIT,))
+            token_rows = cursor.fetchall()
+            if len(token_rows) == CANDIDATE_LIMIT:
+                next_after[0] = (token_rows[-1][3], token_rows[-1][0])
+
+        if 1 in after:
+            keyset_sql, keyset = (" WHERE (score, id) > (?, ?)", after[1]) if after[1] else ("", ())
+            substring_query = f'"{escaped_term}"'
+            cursor.execute(f"""
+                SELECT * FROM (
+                    SELECT e.id, e.type, e.name, n.rank{frecency_sql} AS score
+                    FROM entries_trigram n
+                    JOIN entries e ON e.id = n.rowid
+                    WHERE entries_trigram MATCH ? AND e.type {"=" if kind else "!="} ?
+                ){keyset_sql}
+                ORDER BY score, id
+                LIMIT ?
+            """, frecency_params + (substring_query, kind or ROOT_TYPE) + tuple(keyset) + (CANDIDATE_LIMIT,))
+            substring_rows = cursor.fetchall()
+            if len(substring_rows) == CANDIDATE_LIMIT:
+                next_after[1] = (substring_rows[-1][3], substring_rows[-1][0])
+
+        if substring_searchable(conn, term):
+            rows = rank_together(term, token_rows, substring_rows)
+        else:
+            rows = [(entry_id, entry_type, name, score, 0) for entry_id, entry_type, name, score in token_rows]
+        return rows, next_after
+
+    @staticmethod
+    @traced("search.search_names")
+    def search_names_page(term, kind, cursor=None):
+        """
+        One page of names with the configured backend, falling back to FTS while
+        a fuzzy store is not ready. Returns ([(path, type)], cursor) like search_page.
+        """
+        if cursor is None and SEARCH_BACKEND == "fuzzy":
+            # Every store is asked, so those that are not loaded yet start loading
+            if all([fuzzy_store(db_path).ready() for db_path in shard_paths()]):
+                cursor = NameCursor(term, kind, fuzzy=True)
+        return SearchInFiles.search_page(term, kind, cursor)
+
+    @staticmethod
+    @traced("search.search_files")
+    def search_files_page(term, cursor=None):
+        """Search for files matching the term, a page at a time; returns ([(name, path)], cursor)"""
+        if not term:
+            return [], None
+        results, cursor = SearchInFiles.search_names_page(term, "file", cursor)
+        return [(os.path.basename(path), path) for path, type in results], cursor
 
     @staticmethod
     def search_files(term):
         """Search for files matching the term"""
+        return SearchInFiles.search_files_page(term)[0]
+
+    @staticmethod
+    @traced("search.search_dirs")
+    def search_dirs_page(term, cursor=None):
+        """Search for directories matching the term, a page at a time; returns ([(name, path)], cursor)"""
         if not term:
-            return {}
-        results = SearchInFiles.search(term, "file")
-        return {os.path.basename(path): path for path, type in results[:10]}
-    
+            return [], None
+        results, cursor = SearchInFiles.search_names_page(term, "directory", cursor)
+        return [(os.path.basename(path), path) for path, type in results], cursor
+
     @staticmethod
     def search_dirs(term):
         """Search for directories matching the term"""
+        return SearchInFiles.search_dirs_page(term)[0]
+
+    @staticmethod
+    @traced("search.search_content")
+    def search_content(term, limit=RESULT_LIMIT):
+        """
+        Search the text of indexed files (built with indexer.py --content).
+        Returns [(path, snippet)], best match first.
+        """
         if not term:
-            return {}
-        results = SearchInFiles.search(term, "directory")
-        return {os.path.basename(path): path for path, type in results[:10]}
+            return []
+        results = query_shards(SearchInFiles.search_content_shard, term, limit)
+        return [(path, make_snippet(path, term)) for path, _ in merge_shards(results, limit, lambda row: row[1])]
+
+    @staticmethod
+    def search_content_shard(db_path, term, limit):
+        """Content matches of the shard db_path as (path, rank) rows; none if it has no content index"""
+        conn = get_connection(db_path)
+        if not has_table(conn, "content"):
+            return []
+        return conn.execute(
+            """
+            SELECT f.path, c.rank
+            FROM content c
+            JOIN content_files f ON f.id = c.rowid
+            WHERE c.content MATCH ?
+            ORDER BY c.rank
+            LIMIT ?
+            """,
+            ('"{}"*'.format(term.replace('"', '""')), limit)
+        ).fetchall()
 
     @staticmethod
+    @traced("search.search_application")
     def search_application(term):
         """Search for applications matching the term using the applications database"""
         if not term:
             return {}
         try:
-            conn = sqlite3.connect(APPLICATION_DB_PATH)
-            cursor = conn.cursor()
-            # Prepare the FTS5 query (use wildcard and quote for FTS escaping)
-            escaped_term = term.replace('"', '""')
-            query = f'"{escaped_term}"*'
-            cursor.execute(
-                """
-                SELECT name, command
-                FROM applications
-                WHERE applications MATCH ?
-                LIMIT 10
-                """, 
-                (query,)
-            )
-            results = cursor.fetchall()
-            conn.close()
-            return {name: command for name, command in results}
+            generation = ranking_generation(APPLICATION_DB_PATH)
+            cached = query_cache.get("application", term, generation, RESULT_LIMIT)
+            rows = cached[0] if cached else None
+            if rows is None:
+                cursor = get_connection(APPLICATION_DB_PATH).cursor()
+                # Prepare the FTS5 query (use wildcard and quote for FTS escaping)
+                escaped_term = term.replace('"', '""')
+                query = f'"{escaped_term}"*'
+                cursor.execute(
+                    f"""
+                    SELECT a.name, a.command, a.generic_name, a.keywords
+                    FROM applications a
+                    LEFT JOIN history.launches h ON h.key = a.command
+                    WHERE a.applications MATCH ?
+                    ORDER BY a.rank - ? * {FRECENCY_SQL}
+                    LIMIT ?
+                    """,
+                    (query, FRECENCY_WEIGHT, time.time(), CANDIDATE_LIMIT)
+                )
+                rows = cursor.fetchall()
+                query_cache.put("application", term, generation, rows, len(rows) < CANDIDATE_LIMIT)
+            return {row[0]: row[1] for row in rows[:RESULT_LIMIT]}
         except sqlite3.Error as e:
             print(f"Database error (applications): {e}")
             return {}
@@ -122,16 +968,18 @@ class SearchInFiles():
 
     def open_file(filepath):
         """Open a file using xdg-open"""
+        record_launch("file", filepath)
         try:
-            subprocess.run(["xdg-open", filepath])
+            subprocess.Popen(["xdg-open", filepath], start_new_session=True)
         except Exception as e:
             print(f"Error opening file: {e}")
 
     @staticmethod
     def open_directory(dirpath):
         """Open a directory in the file manager"""
+        record_launch("directory", dirpath)
         try:
-            subprocess.run(["nautilus", dirpath])
+            subprocess.Popen(["nautilus", dirpath], start_new_session=True)
         except Exception as e:
             print(f"Error opening directory: {e}")
 
@@ -141,8 +989,9 @@ class SearchInFiles():
         try:
             if not command:
                 return
+            record_launch("application", command)
             normalized_command = os.path.expandvars(os.path.expanduser(command))
-            subprocess.Popen(shlex.split(normalized_command))
+            subprocess.Popen(shlex.split(normalized_command), start_new_session=True)
         except Exception as e:
             print(f"Error running application: {e}")
 
@@ -0,0 +1,33 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import indexer  # noqa: E402
+import search  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point the indexer and the search module at empty databases in tmp_path"""
+    monkeypatch.setattr(indexer, "DB_PATH", str(tmp_path / "spotlight_index.db"))
+    monkeypatch.setattr(indexer, "APPLICATION_DB_PATH", str(tmp_path / "applications.db"))
+    monkeypatch.setattr(indexer, "SHARD_DIR", tmp_path / "indexes")
+    monkeypatch.setattr(search, "DB_PATH", str(tmp_path / "spotlight_index.db"))
+    monkeypatch.setattr(search, "APPLICATION_DB_PATH", str(tmp_path / "applications.db"))
+    monkeypatch.setattr(search, "HISTORY_DB_PATH", str(tmp_path / "history.db"))
+    monkeypatch.setattr(search, "SHARD_DIR", str(tmp_path / "indexes"))
+    monkeypatch.setattr(search, "query_cache", search.QueryCache())
+    return tmp_path
+
+
+def make_tree(root, files):
+    """Create empty files (relative paths) below root and return root as a string"""
+    for name in files:
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+    return str(root)
@@ -0,0 +1,28 @@
+import sqlite3
+
+import pytest
+
+from desktop_entries import build_catalogue
+
+
+@pytest.fixture
+def no_desktop_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_DATA_DIRS", str(tmp_path / "share"))
+
+
+def applications(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return sorted(conn.execute("SELECT name, command FROM applications"))
+
+
+def test_custom_application_edits_reach_the_catalogue(tmp_path, no_desktop_files):
+    db_path = tmp_path / "applications.db"
+    build_catalogue(db_path, {"foo": "foo-cmd"})
+    assert applications(db_path) == [("foo", "foo-cmd")]
+
+    build_catalogue(db_path, {"Foo": "foo-new", "bar": "bar-cmd"})
+    assert applications(db_path) == [("bar", "bar-cmd"), ("foo", "foo-new")]
+
+    build_catalogue(db_path, {})
+    assert applications(db_path) == []
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from ignore import IgnoreRules, Rule, translate
+from conftest import make_tree
+
+
+def matches(pattern, relative, is_dir=False):
+    path = "/base/" + relative
+    return Rule("/base", pattern).matches(path, os.path.basename(path), is_dir)
+
+
+@pytest.mark.parametrize("pattern, relative, expected", [
+    # * and ? stop at a slash
+    ("docs/*.md", "docs/x.md", True),
+    ("docs/*.md", "docs/sub/x.md", False),
+    ("docs/?.md", "docs/a.md", True),
+    ("a?b/c", "a/b/c", False),
+    ("docs/[ab].md", "docs/a.md", True),
+    ("x[!/]y/z", "x/y/z", False),
+    # ** spans zero or more directories as a whole path component
+    ("**/foo/bar", "foo/bar", True),
+    ("**/foo/bar", "x/y/foo/bar", True),
+    ("**/foo", "deep/in/foo", True),
+    ("a/**/b", "a/b", True),
+    ("a/**/b", "a/x/b", True),
+    ("a/**/b", "a/x/y/b", True),
+    ("a/**/b", "ab", False),
+    ("foo/**", "foo/x", True),
+    ("foo/**", "foo/x/y", True),
+    ("foo/**", "foo", False),
+    ("a**b/c", "ax/yb/c", False),
+    # A leading slash anchors, a pattern without inner slash matches the name anywhere
+    ("/build", "build", True),
+    ("/build", "src/build", False),
+    ("*.pyc", "pkg/mod/x.pyc", True),
+    ("\\*.txt", "*.txt", True),
+    ("\\*.txt", "a.txt", False),
+])
+def test_gitignore_globs(pattern, relative, expected):
+    assert matches(pattern, relative) is expected
+
+
+def test_directory_only_patterns():
+    assert matches("logs/", "logs", is_dir=True)
+    assert not matches("logs/", "logs", is_dir=False)
+
+
+def test_translate_is_anchored_at_both_ends():
+    assert translate("*.md") == "(?s:[^/]*\\.md)\\Z"
+
+
+def test_negation_and_nested_ignore_files(tmp_path):
+    root = make_tree(tmp_path, ["docs/a.md", "docs/keep.md", "docs/sub/b.md", "src/x.log"])
+    (tmp_path / ".gitignore").write_text("docs/*.md\n!docs/keep.md\n")
+    (tmp_path / "src" / ".gitignore").write_text("*.log\n")
+    rules = IgnoreRules.load(root, patterns=())
+    assert rules.for_path(root, os.path.join(root, "docs/a.md")) is None
+    assert rules.for_path(root, os.path.join(root, "docs/keep.md")) is not None
+    assert rules.for_path(root, os.path.join(root, "docs/sub/b.md")) is not None
+    assert rules.for_path(root, os.path.join(root, "src/x.log")) is None
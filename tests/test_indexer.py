@@ -0,0 +1,124 @@
+import os
+import shutil
+import sqlite3
+
+import indexer
+import search
+from conftest import make_tree
+from ignore import IgnoreRules
+from tree import entry_paths
+
+S = search.SearchInFiles
+
+
+def snapshot(root):
+    """{relative path: (type, descended into)} of the indexed entries below root"""
+    with sqlite3.connect(indexer.DB_PATH) as conn:
+        orphans = conn.execute("""
+            SELECT count(*) FROM entries e
+            WHERE e.parent IS NOT NULL AND NOT EXISTS (SELECT 1 FROM entries p WHERE p.id = e.parent)
+        """).fetchone()[0]
+        assert orphans == 0
+        rows = conn.execute("SELECT id, type, inode FROM entries WHERE parent IS NOT NULL").fetchall()
+        paths = entry_paths(conn, [row[0] for row in rows])
+    return {os.path.relpath(paths[entry_id], root): (entry_type, inode is not None)
+            for entry_id, entry_type, inode in rows}
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def content_paths(term):
+    return [os.path.basename(path) for path, _ in S.search_content(term)]
+
+
+def test_rescan_drops_files_edited_in_place_from_content_results(data_dir):
+    root = make_tree(data_dir / "root", ["docs/notes.md", "docs/todo.md"])
+    write(os.path.join(root, "docs", "notes.md"), "quarterly figures\n")
+    write(os.path.join(root, "docs", "todo.md"), "quarterly review\n")
+    indexer.build_index(root, ignore=False, content=True, workers=1)
+    assert sorted(content_paths("quarterly")) == ["notes.md", "todo.md"]
+
+    # Rewriting a file leaves its directory's mtime alone
+    dir_mtime = os.stat(os.path.join(root, "docs")).st_mtime_ns
+    write(os.path.join(root, "docs", "notes.md"), "something else entirely\n")
+    assert os.stat(os.path.join(root, "docs")).st_mtime_ns == dir_mtime
+
+    indexer.rescan(root, ignore=False)
+    assert content_paths("quarterly") == ["todo.md"]
+
+
+def test_apply_changes_follows_creates_renames_and_deletes(data_dir):
+    root = make_tree(data_dir / "root", ["src/main.py", "old/a.txt", "old/sub/b.txt"])
+    write(os.path.join(root, ".gitignore"), "*.log\n")
+    indexer.build_index(root)
+    rules = IgnoreRules.load(root)
+    conn = sqlite3.connect(indexer.DB_PATH)
+
+    make_tree(root, ["new/deep/er/c.txt", "src/d.log", "src/e.txt"])
+    os.rename(os.path.join(root, "old"), os.path.join(root, "moved"))
+    changes = {os.path.join(root, path): recursive for path, recursive in (
+        ("new", True), ("new/deep", True), ("new/deep/er/c.txt", False),
+        ("src/d.log", False), ("src/e.txt", False), ("old", True), ("moved", True))}
+    indexer.apply_changes(conn, root, changes, rules)
+    index = snapshot(root)
+    assert {"new/deep/er/c.txt", "src/e.txt", "moved/a.txt", "moved/sub/b.txt"} <= set(index)
+    assert "src/d.log" not in index
+    assert not [path for path in index if path.startswith("old")]
+
+    # The whole subtree goes, found through the parent ids
+    shutil.rmtree(os.path.join(root, "moved"))
+    indexer.apply_changes(conn, root, {os.path.join(root, "moved"): True}, rules)
+    assert not [path for path in snapshot(root) if path.startswith("moved")]
+    assert not [path for path, _ in S.search("b", "file")]
+    conn.close()
+
+
+def test_apply_changes_replaces_a_directory_turned_symlink(data_dir):
+    root = make_tree(data_dir / "root", ["target/t.txt", "link/inner/x.txt"])
+    indexer.build_index(root, ignore=False)
+    conn = sqlite3.connect(indexer.DB_PATH)
+    link = os.path.join(root, "link")
+
+    shutil.rmtree(link)
+    os.symlink(os.path.join(root, "target"), link)
+    indexer.apply_changes(conn, root, {link: True})
+    index = snapshot(root)
+    assert index["link"] == ("directory", False)
+    assert not [path for path in index if path.startswith("link/")]
+
+    os.unlink(link)
+    make_tree(root, ["link/y.txt"])
+    indexer.apply_changes(conn, root, {link: True})
+    index = snapshot(root)
+    assert index["link"] == ("directory", True)
+    assert "link/y.txt" in index
+    conn.close()
+
+
+def test_rescan_applies_deletes_type_flips_and_inherited_ignores(data_dir):
+    root = make_tree(data_dir / "root", ["keep/a.txt", "gone/sub/b.txt", "flip/inner/c.txt",
+                                         "target/t.txt", "stable/inner/h.txt"])
+    write(os.path.join(root, ".gitignore"), "*.log\n")
+    write(os.path.join(root, "stable", ".gitignore"), "*.tmp\n")
+    indexer.build_index(root)
+
+    shutil.rmtree(os.path.join(root, "gone"))
+    shutil.rmtree(os.path.join(root, "flip"))
+    os.symlink(os.path.join(root, "target"), os.path.join(root, "flip"))
+    make_tree(root, ["new/deep/d.txt", "new/deep/e.log", "keep/f.log", "keep/g.txt",
+                     "stable/inner/i.tmp", "stable/inner/j.log", "stable/inner/k.txt"])
+    indexer.rescan(root)
+
+    index = snapshot(root)
+    assert not [path for path in index if path.startswith(("gone", "flip/"))]
+    assert index["flip"] == ("directory", False)
+    assert {"new/deep/d.txt", "keep/g.txt", "stable/inner/k.txt"} <= set(index)
+    # stable itself did not change: its rules still reach the directory below it
+    assert not {"new/deep/e.log", "keep/f.log", "stable/inner/i.tmp", "stable/inner/j.log"} & set(index)
+
+    # Nothing changed since: a second rescan finds the same index
+    indexer.rescan(root)
+    assert snapshot(root) == index
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import indexer
+import search
+from conftest import make_tree
+
+S = search.SearchInFiles
+
+
+def test_shards_merge_by_rank_key(data_dir):
+    # Without a trigram index each shard reads in plain score order, but results
+    # must still put names starting with the term before other hits
+    a = make_tree(data_dir / "a", ["a report", "reporting long name here many tokens"])
+    b = make_tree(data_dir / "b", ["reportb xx yy zz"])
+    indexer.build_index(a, ignore=False, name="a")
+
+    # One shard orders its results the same way
+    names = [os.path.basename(path) for path, _ in S.search("report", "file")]
+    assert names == ["reporting long name here many tokens", "a report"]
+
+    indexer.build_index(b, ignore=False, name="b")
+    names = [os.path.basename(path) for path, _ in S.search("report", "file")]
+    assert names.index("reporting long name here many tokens") < names.index("a report")
+    assert names.index("reportb xx yy zz") < names.index("a report")
+
+
+def test_pages_cover_every_match_once(data_dir):
+    root = make_tree(data_dir / "root", [f"dir{i % 7}/report_{i}.txt" for i in range(450)])
+    indexer.build_index(root, ignore=False)
+
+    paths = []
+    cursor = None
+    while True:
+        page, cursor = S.search_page("report", "file", cursor)
+        paths += [path for path, _ in page]
+        if cursor is None:
+            break
+    assert len(paths) == len(set(paths)) == 450
+
+
+def test_pages_keep_every_path_of_a_repeated_name(data_dir):
+    root = make_tree(data_dir / "root", [f"pkg{i}/index.js" for i in range(25)] + ["index.html"])
+    indexer.build_index(root, ignore=False)
+
+    rows = []
+    cursor = None
+    while True:
+        page, cursor = S.search_files_page("index", cursor)
+        assert len(page) == 10 or cursor is None
+        rows += page
+        if cursor is None:
+            break
+    assert len(rows) == len({path for _, path in rows}) == 26
+    assert sum(name == "index.js" for name, _ in rows) == 25
+
+
+def test_timed_out_shard_is_not_queried_again(data_dir, monkeypatch):
+    a = make_tree(data_dir / "a", [f"report_{i}.txt" for i in range(30)])
+    b = make_tree(data_dir / "b", [f"report_b{i}.txt" for i in range(30)])
+    indexer.build_index(a, ignore=False, name="a")
+    indexer.build_index(b, ignore=False, name="b")
+    monkeypatch.setattr(search, "SHARD_TIMEOUT", 0.2)
+    peek = search.FtsShard.peek
+    slow_calls = []
+
+    def slow_peek(self, db_path, cursor, need):
+        if db_path.endswith("b.db"):
+            slow_calls.append(db_path)
+            time.sleep(0.5)
+        return peek(self, db_path, cursor, need)
+    monkeypatch.setattr(search.FtsShard, "peek", slow_peek)
+
+    page, cursor = S.search_page("report", "file")
+    assert len(page) == 10 and all("/a/" in path for path, _ in page)
+    page, cursor = S.search_page("report", "file", cursor)
+    assert len(page) == 10
+    assert len(slow_calls) == 1
+
+
+def test_typing_ranks_like_a_fresh_query(data_dir):
+    # Names repeating the term rank best for "rep", but "report" is the only exact name
+    names = ["report"] + [f"reports reportx reporty {i}" for i in range(8)] + [f"my report {i}" for i in range(8)]
+    root = make_tree(data_dir / "root", names)
+    indexer.build_index(root, ignore=False, trigram=True)
+
+    for end in range(1, len("report") + 1):
+        typed = S.search("report"[:end], "file")
+    search.query_cache.entries.clear()
+    fresh = S.search("report", "file")
+    assert [os.path.basename(path) for path, _ in typed][0] == "report"
+    assert typed == fresh
+
+
+def test_concurrent_first_searches_create_the_history_once(data_dir):
+    a = make_tree(data_dir / "a", ["report.txt", "reports"])
+    indexer.build_index(a, ignore=False, name="a")
+    indexer.build_index(a, ignore=False)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(lookup, "report") for lookup in
+                   (S.search_files, S.search_dirs, S.search_application, S.search_files)]
+        results = [future.result() for future in futures]
+    assert results[0] and results[3]
+    assert history_tables(data_dir) == [("launches",)]
+
+
+def history_tables(data_dir):
+    with sqlite3.connect(data_dir / "history.db") as conn:
+        return conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
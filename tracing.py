@@ -0,0 +1,161 @@
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+# Opt-in latency tracing: python3 app.py --trace (or SPOTLIGHT_TRACE=1).
+# While disabled, span() hands back one shared no-op context manager and
+# traced functions are called straight through, so the cost is a flag check.
+
+TRACE_BUFFER = 100_000  # Spans kept for the trace file; the oldest are dropped first
+TRACE_PATH = os.environ.get("SPOTLIGHT_TRACE_FILE") or os.path.join(
+    tempfile.gettempdir(), f"spotlight-trace-{os.getpid()}.json")
+# Histogram bucket upper bounds in milliseconds, doubling from 0.05 ms to ~1.6 s
+BUCKETS_MS = tuple(0.05 * 2 ** i for i in range(16))
+
+enabled = os.environ.get("SPOTLIGHT_TRACE") == "1"
+_lock = threading.Lock()
+_histograms = {}
+_events = deque(maxlen=TRACE_BUFFER)
+_origin = time.perf_counter()
+
+
+class Histogram:
+    """Latency distribution of one span name, in fixed log-scale buckets"""
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (at most the maximum)"""
+        target = p / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, **self.args)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def span(name, **args):
+    """Context manager timing the enclosed block as a span called name"""
+    return _Span(name, args) if enabled else _NO_SPAN
+
+
+def traced(name):
+    """Decorator recording every call of the function as a span called name"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, start)
+        return wrapper
+    return decorate
+
+
+def record(name, start, end=None, **args):
+    """
+    Record a span from perf_counter() timestamps, for intervals that do not
+    fit a with block (e.g. from a keystroke to the paint that follows it).
+    """
+    if not enabled:
+        return
+    end = time.perf_counter() if end is None else end
+    ms = (end - start) * 1000
+    event = {"name": name, "ph": "X", "ts": (start - _origin) * 1e6, "dur": ms * 1000,
+             "pid": os.getpid(), "tid": threading.get_ident()}
+    if args:
+        event["args"] = args
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(ms)
+        _events.append(event)
+
+
+def submit(executor, name, func, *args):
+    """executor.submit(func, *args), recording the time the call waits for a worker"""
+    if not enabled:
+        return executor.submit(func, *args)
+    submitted = time.perf_counter()
+
+    def run():
+        record(name, submitted)
+        return func(*args)
+    return executor.submit(run)
+
+
+def dump_stats(file=None):
+    """Print a latency summary of every span name"""
+    file = file or sys.stderr
+    with _lock:
+        histograms = sorted(_histograms.items())
+    print(f"{'span':<28}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)", file=file)
+    for name, h in histograms:
+        print(f"{name:<28}{h.count:>8}{h.total / h.count:>10.2f}{h.percentile(50):>10.2f}"
+              f"{h.percentile(95):>10.2f}{h.percentile(99):>10.2f}{h.max:>10.2f}", file=file)
+    file.flush()
+
+
+def export_trace(path=TRACE_PATH):
+    """Write the buffered spans as a Chrome trace (chrome://tracing, Perfetto)"""
+    with _lock:
+        events = list(_events)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
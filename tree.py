@@ -0,0 +1,55 @@
+import os
+
+# `entries` stores every directory once: rows point to their directory through
+# `parent`, and the indexed root is a row of type ROOT_TYPE (not searchable)
+# whose name is its absolute path. These helpers map between paths and ids.
+
+ROOT_TYPE = "root"
+
+
+def path_id(conn, path):
+    """Return the (id, type) of the entry at path, or None if it is not indexed"""
+    path = os.path.abspath(path)
+    best = None
+    for entry_id, name in conn.execute("SELECT id, name FROM entries WHERE parent IS NULL"):
+        if path == name or path.startswith(name.rstrip(os.sep) + os.sep):
+            if best is None or len(name) > len(best[1]):
+                best = (entry_id, name)
+    if best is None:
+        return None
+    entry_id, entry_type = best[0], ROOT_TYPE
+    for part in os.path.relpath(path, best[1]).split(os.sep):
+        if part == ".":
+            continue
+        row = conn.execute("SELECT id, type FROM entries WHERE parent = ? AND name = ?", (entry_id, part)).fetchone()
+        if row is None:
+            return None
+        entry_id, entry_type = row
+    return entry_id, entry_type
+
+
+def entry_paths(conn, ids):
+    """Rebuild the full paths of a few entries with a recursive query; returns {id: path}"""
+    if not ids:
+        return {}
+    rows = conn.execute(f"""
+        WITH RECURSIVE up(id, parent, path) AS (
+            SELECT id, parent, name FROM entries WHERE id IN ({', '.join('?' * len(ids))})
+            UNION ALL
+            SELECT up.id, e.parent, rtrim(e.name, '/') || '/' || up.path
+            FROM up JOIN entries e ON e.id = up.parent
+        )
+        SELECT id, path FROM up WHERE parent IS NULL
+    """, list(ids))
+    return dict(rows.fetchall())
+
+
+def directory_paths(conn):
+    """Full paths of every directory (and root) in the index, for bulk path rebuilding"""
+    rows = conn.execute("SELECT id, parent, name FROM entries WHERE type IN ('directory', ?) ORDER BY id",
+                        (ROOT_TYPE,))
+    paths = {}
+    for entry_id, parent, name in rows:
+        # Parents are written before their children, so they always have lower ids
+        paths[entry_id] = name if parent is None else os.path.join(paths.get(parent, ""), name)
+    return paths